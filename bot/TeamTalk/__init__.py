@@ -1,13 +1,12 @@
 import _thread
 import logging
 import os
-import time
 import re
 import sys
 import queue
 
 from bot.sound_devices import SoundDevice, SoundDeviceType
-from bot import errors, vars
+from bot import vars
 
 if sys.platform == "win32":
     if (sys.version_info.major == 3 and sys.version_info.minor >= 8):
@@ -15,11 +14,11 @@ if sys.platform == "win32":
     else:
         os.chdir(vars.directory)
 
-from bot.TeamTalk import thread
+from bot.TeamTalk import connection, mirror, probe, registry, sender, thread
 from bot.TeamTalk.structs import *
 
 import TeamTalkPy
-from TeamTalkPy import TTMessage, ClientEvent, ClientFlags
+from TeamTalkPy import TTMessage
 
 re_line_endings = re.compile('[\\r\\n]')
 
@@ -35,35 +34,57 @@ def _str(data):
 
 
 def split(text, max_length=vars.max_message_length):
-    if len(text) <= max_length:
-        lines = [text]
-    else:
-        lines = ['']
-        for line in text.split('\n'):
-            if len(line) <= max_length:
-                if len(lines[-1]) > 0 and len(lines[-1]) + len(line) + 1 <= max_length:
-                    lines[-1] += '\n' + line
-                elif len(lines) == 1 and len(lines[0]) == 0:
-                    lines[0] = line
+    if _utf8_size(text) <= max_length:
+        return [text]
+    chunks = []
+    chunk = []
+    chunk_size = 0
+    for line in text.split('\n'):
+        line_size = _utf8_size(line)
+        if line_size > max_length:
+            for unit, unit_size, separator in _split_line(line, max_length):
+                if chunk and chunk_size + len(separator) + unit_size <= max_length:
+                    chunk += (separator, unit)
+                    chunk_size += len(separator) + unit_size
                 else:
-                    lines.append(line)
-            else:
-                words = ['']
-                for word in line.split(' '):
-                    if len(word) <= max_length:
-                        if len(words[-1]) > 0 and len(words[-1]) + len(word) + 1 <= max_length:
-                            words[-1] += ' ' + word
-                        elif len(words) == 1 and len(words[0]) == 0:
-                            words[0] == word
-                        else:
-                            words.append(word)
-                    else:
-                        chunk = word
-                        for i in range(0, int(len(chunk) / max_length) + 1):
-                            words.append(chunk[0:max_length])
-                            chunk = chunk[max_length::]
-                lines += words
-    return lines
+                    if chunk:
+                        chunks.append(''.join(chunk))
+                    chunk = [unit]
+                    chunk_size = unit_size
+        elif chunk and chunk_size + 1 + line_size <= max_length:
+            chunk += ('\n', line)
+            chunk_size += 1 + line_size
+        else:
+            if chunk:
+                chunks.append(''.join(chunk))
+            chunk = [line]
+            chunk_size = line_size
+    if chunk:
+        chunks.append(''.join(chunk))
+    return chunks
+
+
+def _split_line(line, max_length):
+    separator = '\n'
+    for word in line.split(' '):
+        word_size = _utf8_size(word)
+        if word_size <= max_length:
+            yield word, word_size, separator
+        else:
+            data = word.encode('utf-8')
+            start = 0
+            while start < len(data):
+                end = min(start + max_length, len(data))
+                while end < len(data) and data[end] & 0xC0 == 0x80:
+                    end -= 1
+                yield data[start:end].decode('utf-8'), end - start, separator
+                start = end
+                separator = ''
+        separator = ' '
+
+
+def _utf8_size(text):
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
 
 
 class TeamTalk:
@@ -80,146 +101,47 @@ class TeamTalk:
         self.load_event_handlers = config["general"]["load_event_handlers"]
         self.event_handlers_file_name = config["general"]["event_handlers_file_name"]
         self.teamtalk_thread = thread.TeamTalkThread(bot, self)
-        self.errors_queue = queue.Queue()
+        self.command_registry = registry.CommandRegistry()
+        self.mirror = mirror.ServerMirror()
+        self.connection = connection.Connection(self, self.config)
+        self.health_probe = probe.HealthProbe(self, self.config)
+        self.message_sender = sender.MessageSender(self, self.config)
         self.message_queue = queue.Queue()
-        self.uploaded_files_queue = queue.Queue()
 
     def initialize(self):
         logging.debug('Initializing TeamTalk')
-        self.connect()
+        self.teamtalk_thread.start()
+        self.message_sender.start()
+        if not self.connection.start():
+            logging.error(self.connection.error)
+            sys.exit(self.connection.error)
+        self.health_probe.start()
         self.change_status_text(self.status)
         logging.debug('TeamTalk initialized')
 
-    def run(self):
-        logging.debug('Starting TeamTalk')
-        self.teamtalk_thread.start()
-        logging.debug('TeamTalk started')
-
     def close(self):
         logging.debug('Closing teamtalk')
+        self.health_probe.close()
+        self.connection.close()
         self.teamtalk_thread.close()
+        self.message_sender.close()
         self.tt.disconnect()
         self.tt.closeTeamTalk()
         logging.debug('Teamtalk closed')
 
-    def connect(self, reconnect=False):
-        if reconnect:
-            logging.info('Reconnecting')
-            if self.tt.getFlags() < ClientFlags.CLIENT_CONNECTED | ClientFlags.CLIENT_AUTHORIZED:
-                self.tt.disconnect()
-        if self.tt.getFlags() < ClientFlags.CLIENT_CONNECTING:
-            connection_attempt = 0
-            while connection_attempt != self.config['reconnection_attempts']:
-                try:
-                    self._connect()
-                    logging.debug("connected")
-                    break
-                except errors.ConnectionError:
-                    if not reconnect:
-                        error = "Cannot connect"
-                        logging.error(error)
-                        sys.exit(error)
-                    else:
-                        time.sleep(self.config['reconnection_timeout'])
-                        connection_attempt += 1
-                        self.tt.disconnect()
-        if self.tt.getFlags() < ClientFlags.CLIENT_CONNECTED:
-            error = "Connection error"
-            logging.error(error)
-            sys.exit(error)
-        if self.tt.getFlags() < ClientFlags.CLIENT_CONNECTED | ClientFlags.CLIENT_AUTHORIZED:
-            login_attempt = 0
-            while login_attempt != self.config['reconnection_attempts']:
-                try:
-                    self._login()
-                    logging.debug("Logged in")
-                    break
-                except errors.LoginError as e:
-                    if not reconnect:
-                        error = "Cannot log in: {}".format(e)
-                        logging.error(error)
-                        sys.exit(error)
-                    else:
-                        time.sleep(self.config['reconnection_timeout'])
-                        login_attempt += 1
-        if self.tt.getFlags() < ClientFlags.CLIENT_CONNECTED | ClientFlags.CLIENT_AUTHORIZED:
-            error = "Login error"
-            logging.error(error)
-            sys.exit(error)
-        if self.tt.getMyChannelID() == 0:
-            join_attempt = 0
-            while join_attempt != self.config['reconnection_attempts']:
-                try:
-                    self._join()
-                    logging.debug("Joined channel")
-                    break
-                except errors.JoinChannelError:
-                    if not reconnect:
-                        error = "Cannot join channel"
-                        logging.error(error)
-                        sys.exit(error)
-                    else:
-                        time.sleep(self.config['reconnection_timeout'])
-                        join_attempt += 1
-        if self.tt.getMyChannelID() == 0:
-            error = "Cannot join channel"
-            logging.error(error)
-            sys.exit(error)
-
-    def _connect(self):
-        self.tt.connect(_str(self.config['hostname']), self.config['tcp_port'], self.config['udp_port'], self.config['encrypted'])
-        try:
-            self.wait_for_event(ClientEvent.CLIENTEVENT_CON_SUCCESS, error_events=[ClientEvent.CLIENTEVENT_CON_FAILED])
-        except errors.TTEventError as e:
-            raise errors.ConnectionError(e)
-
-    def _login(self):
-        cmdid = self.tt.doLogin(_str(self.config['nickname']), _str(self.config['username']), _str(self.config['password']), _str(vars.client_name))
-        try:
-            msg = self.wait_for_event(ClientEvent.CLIENTEVENT_CMD_MYSELF_LOGGEDIN, error_events=[ClientEvent.CLIENTEVENT_CMD_ERROR])
-            self._user_account = self.get_user_account_by_tt_obj(msg.useraccount)
-        except errors.TTEventError as e:
-            raise errors.LoginError(e)
-        try:
-            self.wait_for_event(ClientEvent.CLIENTEVENT_CMD_SERVER_UPDATE)
-        except errors.TTEventError as e:
-            raise errors.LoginError(e)
-        self.wait_for_cmd_success(cmdid)
-
-    def _join(self):
-        if isinstance(self.config['channel'], int):
-            channel_id = int(self.config['channel'])
-        else:
-            channel_id = self.tt.getChannelIDFromPath(_str(self.config['channel']))
-            if channel_id == 0:
-                channel_id = 1
-        cmdid = self.tt.doJoinChannelByID(channel_id, _str(self.config['channel_password']))
-        try:
-            msg = self.wait_for_cmd_success(cmdid)
-        except errors.TTEventError:
-            cmdid = self.tt.doJoinChannelByID(0, _str(''))
-            try:
-                msg = self.wait_for_cmd_success(cmdid)
-            except errors.TTEventError:
-                raise errors.JoinChannelError()
-
-    def wait_for_event(self, event, error_events=[]):
-        get_time = lambda: int(round(time.time()))
-        end = get_time() + vars.tt_event_timeout
-        msg = self.tt.getMessage(vars.tt_event_timeout * 1000)
-        while msg.nClientEvent != event:
-            if get_time() >= end:
-                raise errors.TTEventError()
-            if msg.nClientEvent in error_events:
-                raise errors.TTEventError(_str(msg.clienterrormsg.szErrorMsg))
-            msg = self.tt.getMessage(vars.tt_event_timeout * 1000)
-        return msg
-
-    def wait_for_cmd_success(self, cmdid):
-        while True:
-            msg = self.wait_for_event(ClientEvent.CLIENTEVENT_CMD_SUCCESS)
-            if msg.nSource == cmdid:
-                return
+    def open_connection(self):
+        return self.tt.connect(_str(self.config['hostname']), self.config['tcp_port'], self.config['udp_port'], self.config['encrypted'])
+
+    def login(self):
+        return self.command_registry.send(lambda: self.tt.doLogin(_str(self.nickname), _str(self.config['username']), _str(self.config['password']), _str(vars.client_name)))
+
+    def ping(self):
+        return self.command_registry.send(self.tt.doPing)
+
+    def restore_state(self):
+        self.message_sender.change_status(self.gender.value, _str(self.status))
+        if self.is_voice_transmission_enabled:
+            self.tt.enableVoiceTransmission(True)
 
     @property
     def default_status(self):
@@ -241,7 +163,7 @@ class TeamTalk:
                     message.nToUserID = user.id
             elif type == 2:
                 message.nChannelID = self.tt.getMyChannelID()
-            self.tt.doTextMessage(message)
+            self.message_sender.send(message, sender.Priority.Reply if type == 1 else sender.Priority.Channel)
 
     def send_file(self, channel, file_path):
         if isinstance(channel, int):
@@ -250,7 +172,7 @@ class TeamTalk:
             channel_id = self.tt.getChannelIDFromPath(_str(channel))
             if channel_id == 0:
                 raise ValueError()
-        return self.tt.doSendFile(channel_id, _str(file_path))
+        return self.command_registry.upload(lambda: self.tt.doSendFile(channel_id, _str(file_path)), channel_id, os.path.basename(file_path))
 
     def delete_file(self, channel, file_id):
         if isinstance(channel, int):
@@ -259,7 +181,7 @@ class TeamTalk:
             channel_id = self.tt.getChannelIDFromPath(_str(channel))
             if channel_id == 0 or not isinstance(file_id, int) or file_id == 0:
                 raise ValueError()
-        self.tt.doDeleteFile(channel_id, file_id)
+        return self.command_registry.send(lambda: self.tt.doDeleteFile(channel_id, file_id))
 
     def join_channel(self, channel, password):
         if isinstance(channel, int):
@@ -268,7 +190,7 @@ class TeamTalk:
             channel_id = self.tt.getChannelIDFromPath(_str(channel))
             if channel_id == 0:
                 raise ValueError()
-        cmdid = self.tt.doJoinChannelByID(channel_id, _str(password))
+        return self.command_registry.send(lambda: self.tt.doJoinChannelByID(channel_id, _str(password)))
 
     def change_nickname(self, nickname):
         self.nickname = nickname
@@ -279,15 +201,33 @@ class TeamTalk:
             self.status = split(text)[0]
         else:
             self.status = self.default_status
-        self.tt.doChangeStatus(self.gender.value, _str(self.status))
+        self.message_sender.change_status(self.gender.value, _str(self.status))
 
     def change_gender(self, gender):
         self.gender = UserStatusMode.__members__[gender]
-        self.tt.doChangeStatus(self.gender.value, _str(self.status))
+        self.message_sender.change_status(self.gender.value, _str(self.status))
 
     def get_channel(self, channel_id):
-        channel = self.tt.getChannel(channel_id)
-        return Channel(channel.nChannelID, channel.szName, channel.szTopic, channel.nMaxUsers, ChannelType(channel.uChannelType))
+        channel = self.mirror.channels.get(channel_id)
+        if not channel:
+            channel = self.mirror.update_channel(self.build_channel(self.tt.getChannel(channel_id)))
+        return channel
+
+    def get_channel_id(self, path):
+        return self.tt.getChannelIDFromPath(_str(path))
+
+    def get_channel_path(self, channel_id):
+        return _str(self.tt.getChannelPath(channel_id))
+
+    def build_channel(self, channel):
+        audio_codec = AudioCodecType(channel.audiocodec.nCodec)
+        if audio_codec == AudioCodecType.Opus:
+            bitrate = channel.audiocodec.opus.nBitRate
+        elif audio_codec == AudioCodecType.SpeexVBR:
+            bitrate = channel.audiocodec.speex_vbr.nMaxBitRate or channel.audiocodec.speex_vbr.nBitRate
+        else:
+            bitrate = 0
+        return Channel(channel.nChannelID, channel.szName, channel.szTopic, channel.nMaxUsers, ChannelType(channel.uChannelType), audio_codec, bitrate)
 
     def get_error(self, error_no, cmdid):
         return Error(_str(self.tt.getErrorMessage(error_no)), ErrorType(error_no), cmdid)
@@ -296,6 +236,9 @@ class TeamTalk:
         return Message(re.sub(re_line_endings, '', _str(msg.szMessage)), self.get_user(msg.nFromUserID), self.get_channel(msg.nChannelID), MessageType(msg.nMsgType))
 
     def get_file(self, file):
+        return self.mirror.files.get(file.nFileID) or self.build_file(file)
+
+    def build_file(self, file):
         return File(file.nFileID, _str(file.szFileName), self.get_channel(file.nChannelID), file.nFileSize, _str(file.szUsername))
 
     @property
@@ -309,14 +252,23 @@ class TeamTalk:
         return self.get_channel(self.tt.getMyChannelID())
 
     def get_user(self, id):
-        user = self.tt.getUser(id)
+        user = self.mirror.users.get(id)
+        if not user:
+            user = self.build_user(self.tt.getUser(id))
+            if user.id:
+                user = self.mirror.update_user(user)
+        user.is_admin = user.username in self.admins or user.type == UserType.Admin
+        user.is_banned = user.username in self.banned_users
+        return user
+
+    def build_user(self, user):
         gender = UserStatusMode(user.nStatusMode)
         return User(
             user.nUserID, _str(user.szNickname), _str(user.szUsername),
             _str(user.szStatusMsg), gender, UserState(user.uUserState),
             self.get_channel(user.nChannelID), _str(user.szClientName), user.uVersion,
             self.get_user_account(_str(user.szUsername)), UserType(user.uUserType),
-            True if _str(user.szUsername) in self.config['users']['admins'] or user.uUserType == 2 else False, _str(user.szUsername) in self.config['users']['banned_users']
+            _str(user.szUsername) in self.admins or user.uUserType == 2, _str(user.szUsername) in self.banned_users
         )
 
     def get_user_account(self, username):
@@ -0,0 +1,199 @@
+from enum import Enum
+import logging
+import random
+from threading import Event, RLock, Timer
+import time
+
+from bot import errors, metrics, vars
+
+
+class ConnectionState(Enum):
+    Disconnected = 0
+    Connecting = 1
+    LoggingIn = 2
+    Joining = 3
+    Ready = 4
+
+
+class Connection:
+    def __init__(self, ttclient, config):
+        self.ttclient = ttclient
+        self.config = config
+        self.state = ConnectionState.Disconnected
+        self.error = None
+        self.attempt = 0
+        self.channel_path = None
+        self.channel_password = ''
+        self._lock = RLock()
+        self._settled = Event()
+        self._step = 0
+        self._timer = None
+        self._join_targets = []
+        self._reconnect = False
+        self._lost_time = 0
+        self._closed = False
+
+    def start(self):
+        with self._lock:
+            self._settled.clear()
+            self._connect()
+        self._settled.wait()
+        return self.state == ConnectionState.Ready
+
+    def reconnect(self, reason):
+        with self._lock:
+            if self._closed or self.state == ConnectionState.Disconnected:
+                return
+            if self.state == ConnectionState.Ready:
+                logging.info('Reconnecting')
+                self._reconnect = True
+                self._lost_time = time.monotonic()
+                self.attempt = 0
+            self._fail(reason)
+
+    def rejoin(self):
+        with self._lock:
+            if self._closed or self.state != ConnectionState.Ready:
+                return
+            self._reconnect = True
+            self._lost_time = time.monotonic()
+            self._join()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._next_step()
+            self._settled.set()
+
+    def on_connection_success(self):
+        with self._lock:
+            if self.state == ConnectionState.Connecting:
+                self._login()
+
+    def on_connection_failed(self):
+        with self._lock:
+            if self.state == ConnectionState.Connecting:
+                self._fail('Cannot connect')
+
+    def on_channel_changed(self, channel_id):
+        with self._lock:
+            if self.state == ConnectionState.Ready and channel_id:
+                self.channel_path = self.ttclient.get_channel_path(channel_id)
+                self.channel_password = ''
+
+    def _connect(self):
+        self._set_state(ConnectionState.Connecting)
+        step = self._next_step()
+        if not self.ttclient.open_connection():
+            self._fail('Cannot connect')
+            return
+        self._start_timeout(step)
+
+    def _login(self):
+        self._set_state(ConnectionState.LoggingIn)
+        step = self._next_step()
+        self._start_timeout(step)
+        self.ttclient.login().add_done_callback(lambda future: self._on_result(step, future, self._join, 'Cannot log in'))
+
+    def _join(self):
+        self._set_state(ConnectionState.Joining)
+        self._join_targets = []
+        if self.channel_path:
+            self._join_targets.append((self.channel_path, self.channel_password))
+        channel = self.config['channel']
+        if not isinstance(channel, int):
+            channel = self.ttclient.get_channel_id(channel) or 1
+        self._join_targets += [(channel, self.config['channel_password']), (0, '')]
+        self._join_next()
+
+    def _join_next(self):
+        step = self._next_step()
+        while self._join_targets:
+            channel, password = self._join_targets.pop(0)
+            try:
+                future = self.ttclient.join_channel(channel, password)
+            except ValueError:
+                continue
+            self._start_timeout(step)
+            future.add_done_callback(lambda future: self._on_result(step, future, lambda: self._ready(password), None))
+            return
+        self._fail('Cannot join channel')
+
+    def _on_result(self, step, future, on_success, error):
+        with self._lock:
+            if step != self._step:
+                return
+            try:
+                future.result()
+            except (errors.CommandError, errors.ConnectionError) as e:
+                if error:
+                    self._fail('{}: {}'.format(error, e))
+                else:
+                    self._join_next()
+                return
+            on_success()
+
+    def _ready(self, password):
+        self._next_step()
+        self.attempt = 0
+        self.error = None
+        self.channel_path = self.ttclient.get_channel_path(self.ttclient.tt.getMyChannelID())
+        self.channel_password = password
+        self._set_state(ConnectionState.Ready)
+        if self._reconnect:
+            self.ttclient.restore_state()
+            recovery_time = time.monotonic() - self._lost_time
+            metrics.histogram('teamtalk.connection.recovery_time').add(recovery_time)
+            logging.info('Reconnected in {:.1f} seconds'.format(recovery_time))
+        self._settled.set()
+
+    def _fail(self, error):
+        self._next_step()
+        self.error = error
+        logging.warning(error)
+        self.ttclient.tt.disconnect()
+        self.ttclient.command_registry.cancel_all()
+        self.ttclient.mirror.clear()
+        self._set_state(ConnectionState.Disconnected)
+        if not self._reconnect:
+            self._settled.set()
+            return
+        attempts = self.config['reconnection_attempts']
+        if attempts >= 0 and self.attempt >= attempts:
+            logging.error('Giving up reconnecting after {} attempts'.format(self.attempt))
+            return
+        delay = min(self.config['reconnection_timeout'], vars.reconnection_initial_delay * 2 ** min(self.attempt, 16))
+        delay = random.uniform(delay / 2, delay)
+        self.attempt += 1
+        metrics.counter('teamtalk.connection.attempts').increment()
+        logging.info('Reconnection attempt {} in {:.1f} seconds'.format(self.attempt, delay))
+        self._set_timer(delay, self._on_retry, self._step)
+
+    def _on_retry(self, step):
+        with self._lock:
+            if step == self._step and not self._closed:
+                self._connect()
+
+    def _on_timeout(self, step):
+        with self._lock:
+            if step == self._step:
+                self._fail('Timed out in state {}'.format(self.state.name))
+
+    def _start_timeout(self, step):
+        self._set_timer(vars.connection_step_timeout, self._on_timeout, step)
+
+    def _set_timer(self, delay, function, step):
+        self._timer = Timer(delay, function, (step,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _next_step(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._step += 1
+        return self._step
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.gauge('teamtalk.connection.state').set(state.name)
@@ -0,0 +1,50 @@
+import threading
+
+
+class ServerMirror:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.users = {}
+        self.channels = {}
+        self.files = {}
+
+    def update_user(self, user):
+        with self._lock:
+            if user.id in self.users:
+                existing_user = self.users[user.id]
+                existing_user.__dict__.update(user.__dict__)
+                return existing_user
+            self.users[user.id] = user
+            return user
+
+    def remove_user(self, user_id):
+        with self._lock:
+            self.users.pop(user_id, None)
+
+    def update_channel(self, channel):
+        with self._lock:
+            if channel.id in self.channels:
+                existing_channel = self.channels[channel.id]
+                existing_channel.__dict__.update(channel.__dict__)
+                return existing_channel
+            self.channels[channel.id] = channel
+            return channel
+
+    def remove_channel(self, channel_id):
+        with self._lock:
+            self.channels.pop(channel_id, None)
+
+    def update_file(self, file):
+        with self._lock:
+            self.files[file.id] = file
+            return file
+
+    def remove_file(self, file_id):
+        with self._lock:
+            self.files.pop(file_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.users.clear()
+            self.channels.clear()
+            self.files.clear()
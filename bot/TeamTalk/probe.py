@@ -0,0 +1,84 @@
+from collections import deque
+import logging
+from threading import Event, Thread
+import time
+
+from bot import metrics, vars
+from bot.TeamTalk.connection import ConnectionState
+
+
+class HealthProbe(Thread):
+    def __init__(self, ttclient, config):
+        super().__init__(daemon=True)
+        self.name = 'HealthProbeThread'
+        self.ttclient = ttclient
+        self.interval = config['probe_interval']
+        self.rtt_threshold = config['probe_rtt_threshold'] / 1000
+        self.max_failures = config['probe_max_failures']
+        self.failures = 0
+        self._future = None
+        self._outcomes = deque(maxlen=vars.probe_window)
+        self._close = Event()
+        self.statistics_names = {
+            'nUdpPingTimeMs': 'udp_ping',
+            'nTcpPingTimeMs': 'tcp_ping',
+            'nUdpBytesSent': 'udp_bytes_sent',
+            'nUdpBytesRecv': 'udp_bytes_received',
+            'nVoiceBytesSent': 'voice_bytes_sent',
+            'nVoiceBytesRecv': 'voice_bytes_received',
+            'nTcpServerSilenceSec': 'tcp_server_silence',
+            'nUdpServerSilenceSec': 'udp_server_silence',
+        }
+
+    def run(self):
+        if self.interval <= 0:
+            return
+        while not self._close.wait(self.interval):
+            if self.ttclient.connection.state != ConnectionState.Ready:
+                self.failures = 0
+                self._future = None
+                continue
+            try:
+                self.check()
+                if self.ttclient.connection.state == ConnectionState.Ready:
+                    self.publish_statistics()
+                    self.send()
+            except Exception:
+                logging.error('', exc_info=True)
+
+    def check(self):
+        if not self._future:
+            return
+        rtt = getattr(self._future, 'rtt', None)
+        lost = rtt is None
+        self._outcomes.append(lost)
+        metrics.gauge('teamtalk.probe.loss').set('{:.0%}'.format(sum(self._outcomes) / len(self._outcomes)))
+        if lost:
+            metrics.counter('teamtalk.probe.lost').increment()
+            self.failures += 1
+        elif rtt > self.rtt_threshold:
+            self.failures += 1
+        else:
+            self.failures = 0
+        if self.failures >= self.max_failures > 0:
+            self.failures = 0
+            self._future = None
+            self.ttclient.connection.reconnect('Connection is unhealthy: {}'.format('probe lost' if lost else 'round trip time is {:.0f} ms'.format(rtt * 1000)))
+
+    def send(self):
+        sent_time = time.monotonic()
+        self._future = self.ttclient.ping()
+        self._future.add_done_callback(lambda future: self.on_done(future, sent_time))
+
+    def on_done(self, future, sent_time):
+        if future.exception() is None:
+            future.rtt = time.monotonic() - sent_time
+            metrics.histogram('teamtalk.probe.rtt').add(future.rtt)
+
+    def publish_statistics(self):
+        statistics = self.ttclient.tt.getClientStatistics()
+        for field, name in self.statistics_names.items():
+            metrics.gauge('teamtalk.statistics.{}'.format(name)).set(getattr(statistics, field))
+
+    def close(self):
+        self._close.set()
@@ -0,0 +1,85 @@
+from concurrent.futures import Future
+import threading
+
+from bot import errors
+
+
+class CommandRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+        self._uploads = {}
+
+    def send(self, command):
+        future = Future()
+        with self._lock:
+            future.command_id = command()
+            if future.command_id < 0:
+                future.set_exception(errors.CommandError())
+            else:
+                self._commands[future.command_id] = future
+        return future
+
+    def upload(self, command, channel_id, file_name):
+        future = Future()
+        with self._lock:
+            future.command_id = command()
+            if future.command_id < 0:
+                future.set_exception(errors.CommandError())
+            else:
+                self._uploads[future.command_id] = (channel_id, file_name, future)
+        return future
+
+    def on_success(self, command_id):
+        with self._lock:
+            future = self._commands.pop(command_id, None)
+        if future:
+            future.set_result(None)
+
+    def on_complete(self, command_id):
+        # Some commands, like ping, are only answered by the end of processing
+        self.on_success(command_id)
+
+    def on_error(self, command_id, error):
+        with self._lock:
+            future = self._commands.pop(command_id, None)
+            if not future and command_id in self._uploads:
+                future = self._uploads.pop(command_id)[2]
+        if future:
+            future.set_exception(errors.CommandError(error))
+
+    def on_file_new(self, file):
+        with self._lock:
+            for command_id, (channel_id, file_name, future) in self._uploads.items():
+                if channel_id == file.channel.id and file_name == file.name:
+                    del self._uploads[command_id]
+                    break
+            else:
+                return False
+        future.set_result(file)
+        return True
+
+    def on_upload_failed(self, channel_id, file_name):
+        # A failed transfer is reported only by a file transfer event, never by a command error
+        with self._lock:
+            for command_id, (upload_channel_id, upload_file_name, future) in self._uploads.items():
+                if upload_channel_id == channel_id and upload_file_name == file_name:
+                    del self._uploads[command_id]
+                    break
+            else:
+                return
+        future.set_exception(errors.CommandError())
+
+    def discard(self, future):
+        # Forgets a command or upload that its caller stopped waiting for
+        with self._lock:
+            self._commands.pop(future.command_id, None)
+            self._uploads.pop(future.command_id, None)
+
+    def cancel_all(self):
+        with self._lock:
+            futures = list(self._commands.values()) + [upload[2] for upload in self._uploads.values()]
+            self._commands.clear()
+            self._uploads.clear()
+        for future in futures:
+            future.set_exception(errors.ConnectionError())
@@ -0,0 +1,84 @@
+from enum import Enum
+import itertools
+import queue
+from threading import Lock, Thread
+import time
+
+from bot import metrics
+
+
+class Priority(Enum):
+    Close = 0
+    Reply = 1
+    Channel = 2
+    Status = 3
+
+
+class MessageSender(Thread):
+    def __init__(self, ttclient, config):
+        super().__init__(daemon=True)
+        self.name = 'MessageSenderThread'
+        self.ttclient = ttclient
+        self.rate = config['messages_per_second']
+        self.burst = config['messages_burst']
+        self._tokens = self.burst
+        self._refill_time = time.monotonic()
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._status_lock = Lock()
+        self._status = None
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item[0] == Priority.Close.value:
+                break
+            delay = self._take_token()
+            if delay:
+                # Something more urgent may have arrived while we were throttled
+                self._queue.put(item)
+                item = self._queue.get()
+                if item[0] == Priority.Close.value:
+                    break
+            metrics.gauge('teamtalk.sender.queue_length').set(self._queue.qsize())
+            priority, number, message = item
+            if priority == Priority.Status.value:
+                with self._status_lock:
+                    gender, status = self._status
+                    self._status = None
+                self.ttclient.tt.doChangeStatus(gender, status)
+            else:
+                self.ttclient.tt.doTextMessage(message)
+
+    def close(self):
+        self._queue.put((Priority.Close.value, next(self._counter), None))
+
+    def send(self, message, priority):
+        self._queue.put((priority.value, next(self._counter), message))
+        metrics.gauge('teamtalk.sender.queue_length').set(self._queue.qsize())
+
+    def change_status(self, gender, status):
+        with self._status_lock:
+            is_pending = self._status is not None
+            self._status = (gender, status)
+        if is_pending:
+            metrics.counter('teamtalk.sender.coalesced_statuses').increment()
+        else:
+            self.send(None, Priority.Status)
+
+    def _take_token(self):
+        if self.rate <= 0:
+            # Not throttled
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refill_time) * self.rate)
+        self._refill_time = now
+        delay = 0
+        if self._tokens < 1:
+            delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            self._tokens = 1
+            self._refill_time = time.monotonic()
+        self._tokens -= 1
+        metrics.histogram('teamtalk.sender.throttle_delay').add(delay)
+        return delay
@@ -4,12 +4,15 @@ import TeamTalkPy
 
 
 class Channel:
-    def __init__(self, id, name, topic, max_users, type):
+    def __init__(self, id, name, topic, max_users, type, audio_codec=None, bitrate=0):
         self.id = id
         self.name = name
         topic = topic
         self.max_users = max_users
         self.type = type
+        self.audio_codec = audio_codec
+        # Bits per second the channel encodes at, 0 if the codec does not report it
+        self.bitrate = bitrate
 
 class ChannelType(Flag):
     ClassRoom = TeamTalkPy.ChannelType.CHANNEL_CLASSROOM
@@ -22,6 +25,13 @@ class ChannelType(Flag):
     SoloTransmit = TeamTalkPy.ChannelType.CHANNEL_SOLO_TRANSMIT
 
 
+class AudioCodecType(Enum):
+    NoCodec = TeamTalkPy.Codec.NO_CODEC
+    Speex = TeamTalkPy.Codec.SPEEX_CODEC
+    SpeexVBR = TeamTalkPy.Codec.SPEEX_VBR_CODEC
+    Opus = TeamTalkPy.Codec.OPUS_CODEC
+
+
 class Error:
     def __init__(self, message, type, command_id):
         self.message = message
@@ -1,17 +1,22 @@
 import logging
 import os
 from threading import Thread
+import time
 import types
 import sys
 
 import TeamTalkPy
 
+from bot import metrics, vars
+
+
 class TeamTalkThread(Thread):
     def __init__(self, bot, ttclient):
         Thread.__init__(self, daemon=True)
         self.name = 'TeamTalkThread'
         self.bot = bot
         self.ttclient = ttclient
+        self._close = False
         self.event_names = {
             TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDIN: "user_logged_in",
             TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDOUT: "user_logged_out",
@@ -25,37 +30,140 @@ class TeamTalkThread(Thread):
             TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_NEW: "file_uploaded",
             TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_REMOVE: "file_removed",
         }
+        self.event_labels = {getattr(TeamTalkPy.ClientEvent, name): name.replace("CLIENTEVENT_", "").lower() for name in dir(TeamTalkPy.ClientEvent) if name.startswith("CLIENTEVENT_")}
+        self.handlers = {
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CON_SUCCESS: self.on_connection_success,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CON_FAILED: self.on_connection_failed,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_MYSELF_LOGGEDIN: self.on_logged_in,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_JOINED: self.on_user_joined,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_PROCESSING: self.on_command_processing,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_SUCCESS: self.on_command_success,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_ERROR: self.on_command_error,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_TEXTMSG: self.on_text_message,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_NEW: self.on_file_new,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_FILETRANSFER: self.on_file_transfer,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_MYSELF_KICKED: self.on_kicked,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CON_LOST: self.on_connection_lost,
+        }
+        self.mirror_updaters = {
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDIN: self.update_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_UPDATE: self.update_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_JOINED: self.update_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LEFT: self.update_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_USER_STATECHANGE: self.update_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDOUT: self.remove_user,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_CHANNEL_NEW: self.update_channel,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_CHANNEL_UPDATE: self.update_channel,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_CHANNEL_REMOVE: self.remove_channel,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_NEW: self.update_file,
+            TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_REMOVE: self.remove_file,
+        }
 
     def run(self):
-        from . import _str
         if self.ttclient.load_event_handlers:
             self.event_handlers = self.import_event_handlers()
-        self._close = False
-        while True:
-            if self._close:
+        while not self._close:
+            self.pump(vars.tt_event_timeout)
+
+    def pump(self, timeout):
+        for msg, received_time in self.get_messages(timeout):
+            self.dispatch(msg, received_time)
+
+    def get_messages(self, timeout):
+        messages = []
+        msg = self.ttclient.tt.getMessage(max(int(timeout * 1000), 0))
+        while msg.nClientEvent != TeamTalkPy.ClientEvent.CLIENTEVENT_NONE:
+            messages.append((msg, time.monotonic()))
+            if len(messages) >= vars.tt_event_batch_size:
                 break
-            msg = self.ttclient.tt.getMessage()
-            if msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_NONE:
-                continue
-            elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_ERROR:
-                self.ttclient.errors_queue.put(self.ttclient.get_error(msg.clienterrormsg.nErrorNo, msg.nSource))
-            elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_TEXTMSG and msg.textmessage.nMsgType == 1:
-                self.ttclient.message_queue.put(self.ttclient.get_message(msg.textmessage))
-            elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_FILE_NEW and _str(msg.remotefile.szUsername) == self.ttclient.config["username"] and msg.remotefile.nChannelID == self.ttclient.channel.id:
-                self.ttclient.uploaded_files_queue.put(self.ttclient.get_file(msg.remotefile))
-            elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_MYSELF_KICKED:
-                logging.warning('Kicked')
-                self.ttclient.connect(reconnect=True)
-            elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CON_LOST:
-                logging.warning('Server lost')
-                print("ah")
-                try:
-                    self.ttclient.connect(reconnect=True)
-                except Exception as e:
-                    logging.fatal(e)
-                print("bh")
-            elif msg.nClientEvent in self.event_names and self.ttclient.load_event_handlers:
-                self.run_event_handler(msg)
+            msg = self.ttclient.tt.getMessage(0)
+        return messages
+
+    def dispatch(self, msg, received_time):
+        mirror_updater = self.mirror_updaters.get(msg.nClientEvent)
+        handler = self.handlers.get(msg.nClientEvent, self.on_event)
+        for function in (mirror_updater, handler):
+            try:
+                if function:
+                    function(msg)
+            except Exception:
+                logging.error("", exc_info=True)
+        event_label = self.event_labels.get(msg.nClientEvent, str(msg.nClientEvent))
+        metrics.counter("teamtalk.events.{}".format(event_label)).increment()
+        metrics.histogram("teamtalk.events.{}.latency".format(event_label)).add(time.monotonic() - received_time)
+
+    def update_user(self, msg):
+        self.ttclient.mirror.update_user(self.ttclient.build_user(msg.user))
+
+    def remove_user(self, msg):
+        self.ttclient.mirror.remove_user(msg.user.nUserID)
+
+    def update_channel(self, msg):
+        self.ttclient.mirror.update_channel(self.ttclient.build_channel(msg.channel))
+
+    def remove_channel(self, msg):
+        self.ttclient.mirror.remove_channel(msg.channel.nChannelID)
+
+    def update_file(self, msg):
+        self.ttclient.mirror.update_file(self.ttclient.build_file(msg.remotefile))
+
+    def remove_file(self, msg):
+        self.ttclient.mirror.remove_file(msg.remotefile.nFileID)
+
+    def on_command_success(self, msg):
+        self.ttclient.command_registry.on_success(msg.nSource)
+
+    def on_command_processing(self, msg):
+        if not msg.bActive:
+            self.ttclient.command_registry.on_complete(msg.nSource)
+
+    def on_command_error(self, msg):
+        self.ttclient.command_registry.on_error(msg.nSource, self.ttclient.get_error(msg.clienterrormsg.nErrorNo, msg.nSource))
+
+    def on_text_message(self, msg):
+        if msg.textmessage.nMsgType == 1:
+            self.ttclient.message_queue.put(self.ttclient.get_message(msg.textmessage))
+        else:
+            self.on_event(msg)
+
+    def on_file_new(self, msg):
+        from . import _str
+        if not (_str(msg.remotefile.szUsername) == self.ttclient.config["username"] and self.ttclient.command_registry.on_file_new(self.ttclient.get_file(msg.remotefile))):
+            self.on_event(msg)
+
+    def on_file_transfer(self, msg):
+        from . import _str
+        transfer = msg.filetransfer
+        if not transfer.bInbound and transfer.nStatus == TeamTalkPy.FileTransferStatus.FILETRANSFER_ERROR:
+            self.ttclient.command_registry.on_upload_failed(transfer.nChannelID, os.path.basename(_str(transfer.szRemoteFileName)))
+
+    def on_connection_success(self, msg):
+        self.ttclient.connection.on_connection_success()
+
+    def on_connection_failed(self, msg):
+        self.ttclient.connection.on_connection_failed()
+
+    def on_logged_in(self, msg):
+        self.ttclient._user_account = self.ttclient.get_user_account_by_tt_obj(msg.useraccount)
+
+    def on_user_joined(self, msg):
+        if msg.user.nUserID == self.ttclient.tt.getMyUserID():
+            self.ttclient.connection.on_channel_changed(msg.user.nChannelID)
+        self.on_event(msg)
+
+    def on_kicked(self, msg):
+        logging.warning('Kicked')
+        if self.ttclient.tt.getFlags() & TeamTalkPy.ClientFlags.CLIENT_AUTHORIZED:
+            self.ttclient.connection.rejoin()
+        else:
+            self.ttclient.connection.reconnect('Kicked from server')
+
+    def on_connection_lost(self, msg):
+        self.ttclient.connection.reconnect('Server lost')
+
+    def on_event(self, msg):
+        if msg.nClientEvent in self.event_names and self.ttclient.load_event_handlers:
+            self.run_event_handler(msg)
 
     def close(self):
         self._close = True
@@ -75,8 +183,10 @@ class TeamTalkThread(Thread):
         return module
 
     def parse_event(self, msg):
-        if msg.nClientEvent in (TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_UPDATE, TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_JOINED, TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDIN, TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDOUT):
+        if msg.nClientEvent in (TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_UPDATE, TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_JOINED, TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDIN):
             return (self.ttclient.get_user(msg.user.nUserID),)
+        elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LOGGEDOUT:
+            return (self.ttclient.build_user(msg.user),)
         elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_LEFT:
             return (msg.nSource, self.ttclient.get_user(msg.user.nUserID))
         elif msg.nClientEvent == TeamTalkPy.ClientEvent.CLIENTEVENT_CMD_USER_TEXTMSG:
@@ -1,9 +1,8 @@
 import logging
 import queue
 import sys
-import time
 
-from bot import cache, commands, config, connectors, logger, modules, player, services, sound_devices, TeamTalk, translator, vars
+from bot import cache, commands, config, connectors, logger, metrics, modules, player, services, sound_devices, TeamTalk, translator, vars
 
 
 class Bot:
@@ -25,9 +24,10 @@ class Bot:
         self.ttclient = TeamTalk.TeamTalk(self, self.config)
         self.tt_player_connector = connectors.TTPlayerConnector(self.player, self.ttclient)
         self.sound_device_manager = sound_devices.SoundDeviceManager(self.config['sound_devices'], self. player, self.ttclient)
-        self.service_manager = services.ServiceManager(self.config['services'])
+        self.service_manager = services.ServiceManager(self.config['services'], self.ttclient)
         self.module_manager = modules.ModuleManager(self.config, self.player, self.ttclient, self.service_manager)
         self.command_processor = commands.CommandProcessor(self, self.config, self.player, self.ttclient, self.module_manager, self.service_manager, self.cache)
+        self.metrics_reporter = metrics.MetricsReporter(self.config['logger']['metrics_interval'])
 
     def initialize(self):
         if self.config['logger']['log']:
@@ -41,30 +41,35 @@ class Bot:
 
     def run(self):
         logging.debug('Starting')
-        self.ttclient.run()
         self.player.run()
         self.tt_player_connector.start()
+        self.metrics_reporter.start()
         logging.info('Started')
         self._close = False
         while not self._close:
             try:
-                message = self.ttclient.message_queue.get_nowait()
-                logging.info("New message {text} from {username}".format(text=message.text, username=message.user.username))
-                reply_text = self.command_processor(message)
-                logging.info('replied {text}'.format(text=reply_text))
-                if reply_text:
-                    self.ttclient.send_message(reply_text, message.user)
+                message = self.ttclient.message_queue.get(timeout=self.message_wait_timeout)
             except queue.Empty:
-                pass
-            time.sleep(vars.loop_timeout)
+                continue
+            if message is None:
+                break
+            logging.info("New message {text} from {username}".format(text=message.text, username=message.user.username))
+            self.command_processor.dispatch(message)
 
+    @property
+    def message_wait_timeout(self):
+        # A blocking lock acquire can't be interrupted by Ctrl+C on Windows, so wake up periodically there
+        return vars.windows_wait_timeout if sys.platform == 'win32' else None
 
     def close(self):
         logging.debug('Closing bot')
         self.player.close()
         self.ttclient.close()
         self.tt_player_connector.close()
+        self.command_processor.close()
+        self.metrics_reporter.close()
         self.config.close()
         self.cache.close()
         self._close = True
+        self.ttclient.message_queue.put(None)
         logging.info('Bot closed')
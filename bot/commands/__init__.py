@@ -1,8 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import re
+import threading
+import time
 import traceback
 
-from bot import errors
+from bot import errors, metrics
+from bot.commands.command import ExecutionType, PagedList
 from bot.commands.admin_commands import *
 from bot.commands.user_commands import *
 from bot.TeamTalk.structs import UserType
@@ -23,6 +27,13 @@ class CommandProcessor:
         self.send_channel_messages = self.config["general"]["send_channel_messages"]
         self.locked = False
         self.blocked_commands = self.config["general"]["blocked_commands"]
+        self.executor = ThreadPoolExecutor(max_workers=self.config["general"]["command_workers"], thread_name_prefix='CommandWorker')
+        # A single worker runs serialized commands one at a time, in the order they arrived
+        self.serial_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='SerialCommandWorker')
+        self._queue_lock = threading.Lock()
+        self.queue_depth = 0
+        self._pages_lock = threading.Lock()
+        self.pages = {}
         self.commands_dict = {
             'h': HelpCommand(self),
             'a': AboutCommand(self),
@@ -42,6 +53,13 @@ class CommandProcessor:
             'gl': GetLinkCommand(self),
             "dl": DownloadCommand(self),
             "r": RecentsCommand(self),
+            "pg": NextPageCommand(self),
+            'qa': QueueAddCommand(self),
+            'qn': QueueNextCommand(self),
+            'qm': QueueMoveCommand(self),
+            'qr': QueueRemoveCommand(self),
+            'qd': QueueDeduplicateCommand(self),
+            'ql': QueueListCommand(self),
         }
         self.admin_commands_dict = {
             'girl': lambda arg, user: "".join([chr(int(__import__("math").sqrt(ord(i) + 2 ** 20))) for i in "𐱁🼄🚉𛋹𤮱𝴤𘤀"]),
@@ -58,17 +76,59 @@ class CommandProcessor:
             'ub': BannedUsersCommand(self),
             "eh": EventHandlingCommand(self),
             'sc': SaveConfigCommand(self),
+            'st': StatisticsCommand(self),
             'va': VoiceTransmissionCommand(self),
             'rs': RestartCommand(self),
             'q': QuitCommand(self),
         }
 
+    def dispatch(self, message):
+        execution_type = self.get_execution_type(message.text)
+        if execution_type == ExecutionType.Inline:
+            self.run(message, execution_type, time.monotonic())
+        else:
+            with self._queue_lock:
+                self.queue_depth += 1
+            executor = self.serial_executor if execution_type == ExecutionType.Serialized else self.executor
+            executor.submit(self.run, message, execution_type, time.monotonic())
+
+    def run(self, message, execution_type, queued_time):
+        if execution_type != ExecutionType.Inline:
+            with self._queue_lock:
+                self.queue_depth -= 1
+        metric_name = self.get_metric_name(message.text)
+        try:
+            metrics.histogram('command.{}.queued'.format(metric_name)).add(time.monotonic() - queued_time)
+            reply_text = self(message)
+            if isinstance(reply_text, PagedList):
+                reply_text = self.get_page(message.user, reply_text)
+            logging.info('replied {text}'.format(text=reply_text))
+            if reply_text:
+                start_time = time.monotonic()
+                self.ttclient.send_message(reply_text, message.user)
+                metrics.histogram('command.{}.send'.format(metric_name)).add(time.monotonic() - start_time)
+        except Exception:
+            logging.error("", exc_info=True)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.serial_executor.shutdown(wait=False)
+
     def __call__(self, message):
+        metric_name = self.get_metric_name(message.text)
+        metrics.counter('command.{}.count'.format(metric_name)).increment()
         try:
             command_name, arg = self.parse_command(message.text)
-            if self.check_access(message.user, command_name):
+            start_time = time.monotonic()
+            has_access = self.check_access(message.user, command_name)
+            metrics.histogram('command.{}.access'.format(metric_name)).add(time.monotonic() - start_time)
+            if has_access:
                 command = self.get_command(command_name, message.user)
-                return command(arg, message.user)
+                start_time = time.monotonic()
+                try:
+                    return command(arg, message.user)
+                finally:
+                    metrics.histogram('command.{}.run'.format(metric_name)).add(time.monotonic() - start_time)
         except errors.InvalidArgumentError:
             return self.help(command_name, message.user)
         except errors.AccessDeniedError as e:
@@ -76,6 +136,7 @@ class CommandProcessor:
         except (errors.ParseCommandError, errors.UnknownCommandError):
             return _("Unknown command. Send \"h\" for help.")
         except Exception as e:
+            metrics.counter('command.{}.errors'.format(metric_name)).increment()
             logging.error("", exc_info=True)
             return _("Error: {}").format(e)
 
@@ -96,6 +157,28 @@ class CommandProcessor:
         else:
             return True
 
+    def get_metric_name(self, text):
+        try:
+            command_name, arg = self.parse_command(text)
+        except errors.ParseCommandError:
+            return 'unknown'
+        if command_name in self.commands_dict or command_name in self.admin_commands_dict:
+            return command_name
+        return 'unknown'
+
+    def get_execution_type(self, text):
+        try:
+            command_name, arg = self.parse_command(text)
+        except errors.ParseCommandError:
+            return ExecutionType.Inline
+        if command_name in self.commands_dict:
+            command = self.commands_dict[command_name]
+        elif command_name in self.admin_commands_dict:
+            command = self.admin_commands_dict[command_name]
+        else:
+            return ExecutionType.Inline
+        return getattr(command, 'execution_type', ExecutionType.Serialized)
+
     def get_command(self, command, user):
         if command in self.commands_dict:
             return self.commands_dict[command]
@@ -113,13 +196,30 @@ class CommandProcessor:
             else:
                 return _("Unknown command")
         else:
-            help_strings = []
-            for i in list(self.commands_dict):
-                help_strings.append(self.help(i, user))
+            command_names = list(self.commands_dict)
             if user.is_admin:
-                for i in list(self.admin_commands_dict)[1::]:
-                    help_strings.append(self.help(i, user))
-            return '\n'.join(help_strings)
+                command_names += list(self.admin_commands_dict)[1::]
+            return PagedList(self.help(i, user) for i in command_names)
+
+    def get_page(self, user, pages=None):
+        now = time.monotonic()
+        with self._pages_lock:
+            for user_id in [i for i in self.pages if self.pages[i][1] < now]:
+                del self.pages[user_id]
+            if pages is None:
+                if user.id not in self.pages:
+                    return None
+                pages = self.pages.pop(user.id)[0]
+            else:
+                self.pages.pop(user.id, None)
+        # Lines can name tracks that are not resolved yet, so they are rendered without holding the lock
+        lines = pages.next_page(vars.page_size)
+        if pages.has_more:
+            with self._pages_lock:
+                # A list requested meanwhile replaces this one
+                self.pages.setdefault(user.id, (pages, time.monotonic() + vars.page_expiry))
+            lines.append(_('Send "pg" for the next page'))
+        return '\n'.join(lines)
 
     def parse_command(self, text):
         text = text.strip()
@@ -2,12 +2,14 @@ import os
 import subprocess
 import sys
 
-from bot.commands.command import AdminCommand
+from bot.commands.command import AdminCommand, ExecutionType, PagedList
 from bot.player.enums import State
-from bot import errors, translator, vars
+from bot import errors, metrics, translator, vars
 
 
 class BlockCommandCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
             return _("+/-COMMAND Blocks or unblocks commands. +COMMAND adds command to the blocklist. -COMMAND removes from it. Without a command shows the blocklist")
@@ -35,6 +37,8 @@ class BlockCommandCommand(AdminCommand):
 
 
 class ChangeGenderCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("GENDER Changes bot's gender. n neutral, m male, f female")
@@ -48,6 +52,8 @@ class ChangeGenderCommand(AdminCommand):
 
 
 class ChangeLanguageCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("LANGUAGE Changes bot's language")
@@ -66,6 +72,8 @@ class ChangeLanguageCommand(AdminCommand):
 
 
 class ChangeNicknameCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('NICKNAME Changes bot\'s nickname')
@@ -76,6 +84,8 @@ class ChangeNicknameCommand(AdminCommand):
 
 
 class ClearCacheCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("r/f Clears bot's cache. r clears recents, f clears favorites, without an option clears the entire cache")
@@ -132,6 +142,8 @@ class TaskSchedulerCommand(AdminCommand):
 
 
 class VoiceTransmissionCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Enables or disables voice transmission')
@@ -150,6 +162,8 @@ class VoiceTransmissionCommand(AdminCommand):
 
 
 class LockCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Locks or unlocks the bot')
@@ -161,6 +175,8 @@ class LockCommand(AdminCommand):
 
 
 class ChangeStatusCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("STATUS Changes bot's status")
@@ -172,6 +188,8 @@ class ChangeStatusCommand(AdminCommand):
 
 
 class EventHandlingCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
             return _("Enables or disables event handling")
@@ -183,6 +201,8 @@ class EventHandlingCommand(AdminCommand):
 
 
 class ChannelMessagesCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("Enables or disables sending of channel messages")
@@ -194,6 +214,8 @@ class ChannelMessagesCommand(AdminCommand):
 
 
 class SaveConfigCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("Saves bot's configuration")
@@ -202,7 +224,24 @@ class SaveConfigCommand(AdminCommand):
         self.config.save()
         return _('Configuration saved')
 
+
+class StatisticsCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
+    @property
+    def help(self):
+        return _("Shows command counters and latency statistics")
+
+    def __call__(self, arg, user):
+        lines = metrics.summary()
+        if self.command_processor.queue_depth:
+            lines.insert(0, _("Queued commands: {}").format(self.command_processor.queue_depth))
+        return PagedList(lines) if lines else _("The list is empty")
+
+
 class AdminUsersCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('+/-USERNAME Manages a list of administrators. +USERNAME adds a user. -USERNAME removes it. Without an option shows the list')
@@ -230,6 +269,8 @@ class AdminUsersCommand(AdminCommand):
 
 
 class BannedUsersCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('+/-USERNAME Manages a list of banned users. +USERNAME adds a user. -USERNAME removes it. Without an option shows the list')
@@ -258,6 +299,8 @@ class BannedUsersCommand(AdminCommand):
 
 
 class QuitCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Quits the bot')
@@ -266,6 +309,8 @@ class QuitCommand(AdminCommand):
         self.bot.close()
 
 class RestartCommand(AdminCommand):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Restarts the bot')
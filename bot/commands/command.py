@@ -1,5 +1,33 @@
 
-class Command:  
+from enum import Enum
+
+
+class ExecutionType(Enum):
+    Inline = 0
+    Concurrent = 1
+    Serialized = 2
+
+
+class PagedList:
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._next_line = next(self._lines, None)
+
+    @property
+    def has_more(self):
+        return self._next_line is not None
+
+    def next_page(self, size):
+        page = []
+        while self._next_line is not None and len(page) < size:
+            page.append(self._next_line)
+            self._next_line = next(self._lines, None)
+        return page
+
+
+class Command:
+    execution_type = ExecutionType.Serialized
+
     def __init__(self, command_processor):
         self.cache = command_processor.cache
         self.command_processor = command_processor
@@ -1,10 +1,12 @@
-from bot.commands.command import Command
+from bot.commands.command import Command, ExecutionType, PagedList
 from bot.player.enums import Mode, State, TrackType
 from bot.TeamTalk.structs import UserRight
 from bot import errors, vars
 
 
 class HelpCommand(Command):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Shows command help')
@@ -14,6 +16,8 @@ class HelpCommand(Command):
 
 
 class AboutCommand(Command):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Shows information about the bot')
@@ -23,6 +27,8 @@ class AboutCommand(Command):
 
 
 class PlayPauseCommand(Command):
+    execution_type = ExecutionType.Concurrent
+
     @property
     def help(self):
         return _('QUERY Plays tracks found for the query. If no query is given, plays or pauses current track')
@@ -39,13 +45,18 @@ class PlayPauseCommand(Command):
             except errors.NothingFoundError:
                 return _('Nothing is found for your query')
         else:
-            if self.player.state == State.Playing:
-                self.player.pause()
-            elif self.player.state == State.Paused:
-                self.player.play()
+            try:
+                if self.player.state in (State.Loading, State.Playing, State.Buffering):
+                    self.player.pause()
+                elif self.player.state == State.Paused:
+                    self.player.play()
+            except errors.NothingIsPlayingError:
+                return _('Nothing is playing')
 
 
 class PlayUrlCommand(Command):
+    execution_type = ExecutionType.Concurrent
+
     @property
     def help(self):
         return _('URL Plays a stream from a given URL')
@@ -173,12 +184,7 @@ class ModeCommand(Command):
         mode_help = _("Current_ mode: {current_mode}\n{modes}").format(current_mode=self.mode_names[self.player.mode], modes='\n'.join(['{value} {name}'.format(name=self.mode_names[i], value=i.value) for i in Mode.__members__.values()]))
         if arg:
             try:
-                mode = Mode(arg.lower())
-                if mode == Mode .Random:
-                    self.player.shuffle(True)
-                if self.player.mode == Mode.Random and mode != Mode.Random:
-                    self.player.shuffle(False)
-                self.player.mode = Mode(mode)
+                self.player.set_mode(Mode(arg.lower()))
                 return _("Current mode: {mode}").format(mode=self.mode_names[self.player.mode])
             except ValueError:
                 return 'Incorrect mode\n' + mode_help
@@ -187,6 +193,8 @@ class ModeCommand(Command):
 
 
 class ServiceCommand(Command):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('SERVICE Selects the service to play from. If no service is specified, the current service and a list of available services are displayed')
@@ -297,16 +305,10 @@ class FavoritesCommand(Command):
             return _('Nothing is playing')
 
     def _list(self, user):
-        track_names = []
-        try:
-            for number, track in enumerate(self.cache.favorites[user.username]):
-                track_names.append('{number}: {track_name}'.format(number=number + 1, track_name=track.name if track.name else track.url))
-        except KeyError:
-            pass
-        if len(track_names) > 0:
-            return '\n'.join(track_names)
-        else:
+        tracks = list(self.cache.favorites.get(user.username, []))
+        if not tracks:
             return _('List is empty')
+        return PagedList('{number}: {track_name}'.format(number=number + 1, track_name=track.name if track.name else track.url) for number, track in enumerate(tracks))
 
     def _play(self, arg, user):
         try:
@@ -320,6 +322,8 @@ class FavoritesCommand(Command):
 
 
 class GetLinkCommand(Command):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _('Gets a direct link to the current track')
@@ -349,16 +353,15 @@ class RecentsCommand(Command):
             except IndexError:
                 return _('Out of list')
         else:
-            track_names = []
-            for number, track in enumerate(reversed(self.cache.recents)):
-                if track.name:
-                    track_names.append(f'{number + 1}: {track.name}')
-                else:
-                    track_names.append(f'{number + 1}: {track.url}')
-            return '\n'.join(track_names) if track_names else _('The list is empty')
+            tracks = list(reversed(self.cache.recents))
+            if not tracks:
+                return _('The list is empty')
+            return PagedList(f'{number + 1}: {track.name if track.name else track.url}' for number, track in enumerate(tracks))
 
 
 class DownloadCommand(Command):
+    execution_type = ExecutionType.Inline
+
     @property
     def help(self):
         return _("Downloads the current track and uploads it to the channel")
@@ -375,3 +378,108 @@ class DownloadCommand(Command):
                 return _('Live streams cannot be downloaded')
         else:
             return _('Nothing is playing')
+
+
+class NextPageCommand(Command):
+    execution_type = ExecutionType.Inline
+
+    @property
+    def help(self):
+        return _('Shows the next page of the last list')
+
+    def __call__(self, arg, user):
+        page = self.command_processor.get_page(user)
+        return page if page else _('No more pages')
+
+
+class QueueAddCommand(Command):
+    execution_type = ExecutionType.Concurrent
+
+    @property
+    def help(self):
+        return _('QUERY Adds the first track found for the query to the end of the queue')
+
+    def __call__(self, arg, user):
+        if not arg:
+            raise errors.InvalidArgumentError()
+        try:
+            track = self.service_manager.service.search(arg)[0]
+        except errors.NothingFoundError:
+            return _('Nothing is found for your query')
+        if self.command_processor.send_channel_messages:
+            self.ttclient.send_message(_("{nickname} queued {request}").format(nickname=user.nickname, request=arg), type=2)
+        index = self.enqueue([track])
+        return _('Queued {} {}').format(index + 1, arg)
+
+    def enqueue(self, tracks):
+        return self.player.enqueue(tracks)
+
+
+class QueueNextCommand(QueueAddCommand):
+    @property
+    def help(self):
+        return _('QUERY Plays the first track found for the query after the current one')
+
+    def enqueue(self, tracks):
+        return self.player.enqueue_next(tracks)
+
+
+class QueueMoveCommand(Command):
+    @property
+    def help(self):
+        return _('NUMBER NUMBER Moves a track from the first position in the queue to the second one')
+
+    def __call__(self, arg, user):
+        try:
+            source, target = [int(number) - 1 for number in arg.split()]
+            if source < 0 or target < 0:
+                raise ValueError()
+        except ValueError:
+            raise errors.InvalidArgumentError()
+        try:
+            self.player.move_track(source, target)
+            return _('Moved')
+        except errors.IncorrectTrackIndexError:
+            return _('Out of list')
+
+
+class QueueRemoveCommand(Command):
+    @property
+    def help(self):
+        return _('NUMBER or NUMBER-NUMBER Removes a track or a range of tracks from the queue. Removing the current track plays the next one')
+
+    def __call__(self, arg, user):
+        try:
+            numbers = [int(number) for number in arg.split('-')]
+            if len(numbers) not in (1, 2) or min(numbers) < 1:
+                raise ValueError()
+        except ValueError:
+            raise errors.InvalidArgumentError()
+        try:
+            self.player.remove_tracks(numbers[0] - 1, numbers[-1])
+            return _('Removed')
+        except errors.IncorrectTrackIndexError:
+            return _('Out of list')
+
+
+class QueueDeduplicateCommand(Command):
+    @property
+    def help(self):
+        return _('Removes repeated tracks from the queue')
+
+    def __call__(self, arg, user):
+        return _('Removed {} tracks').format(self.player.remove_duplicates())
+
+
+class QueueListCommand(Command):
+    @property
+    def help(self):
+        return _('Shows the queue')
+
+    def __call__(self, arg, user):
+        tracks = list(self.player.track_list)
+        if not tracks:
+            return _('The queue is empty')
+        current_index = self.player.track_index
+        # Cached names only: listing must not resolve every track it shows
+        return PagedList('{marker}{number}: {track_name}'.format(marker='* ' if number == current_index else '', number=number + 1, track_name=track.get_cached_meta()['name'] or track.get_page_url()) for number, track in enumerate(tracks))
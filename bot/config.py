@@ -15,6 +15,7 @@ default_config = {
         "time_format": r"%H:%M",
         "load_event_handlers": False,
         "event_handlers_file_name": "event_handlers.py",
+        "command_workers": 4,
     },
     "sound_devices": {
         "output_device": 0,
@@ -25,7 +26,39 @@ default_config = {
         "max_volume": 100,
         "volume_fading": True,
         "volume_fading_interval": 0.025,
+        "volume_fading_curve": "linear",
         "seek_step": 5,
+        "prefetch_tracks": 1,
+        "gapless": False,
+        "crossfade": 0,
+        "stall_timeout": 10,
+        "stall_max_reconnects": 5,
+        "playback_profiles": {
+            "default": {
+                "cache": "yes",
+                "cache-secs": "600",
+                "demuxer-readahead-secs": "600",
+                "demuxer-max-bytes": "64MiB",
+                "network-timeout": "30"
+            },
+            "live": {
+                "cache": "yes",
+                "cache-secs": "5",
+                "demuxer-readahead-secs": "1",
+                "demuxer-max-bytes": "4MiB",
+                "network-timeout": "10"
+            },
+            "direct": {
+                "cache": "yes",
+                "cache-secs": "10",
+                "demuxer-readahead-secs": "5",
+                "demuxer-max-bytes": "16MiB",
+                "network-timeout": "15"
+            },
+            "local": {
+                "cache": "no"
+            }
+        },
         "player_options": {
             "video": False,
             "ytdl": False
@@ -47,6 +80,11 @@ default_config = {
         "license_key": "",
         "reconnection_attempts": -1,
         "reconnection_timeout": 10,
+        "messages_per_second": 5,
+        "messages_burst": 10,
+        "probe_interval": 30,
+        "probe_rtt_threshold": 2000,
+        "probe_max_failures": 3,
         "users": {
             "admins": ["admin"],
             "banned_users": []
@@ -57,7 +95,9 @@ default_config = {
             "vk": {
                 "token": "",
             },
-            "yt": {}
+            "yt": {
+                "match_channel_bitrate": True
+            }
         },
         "default_service": "vk"
     },
@@ -68,7 +108,8 @@ default_config = {
         "mode": "FILE",
         "file_name": "TTMediaBot.log",
         "max_file_size": 0,
-        "backup_count": 0
+        "backup_count": 0,
+        "metrics_interval": 600
     }
 }
 
@@ -97,10 +138,18 @@ class Config(dict):
                 sys.exit("Incorrect configuration file path")
         else:
             config_dict = {}
+        # Profiles are free-form mpv options, so a profile given in the file replaces the default one instead of being merged with it
+        playback_profiles = config_dict.get("player", {}).pop("playback_profiles", {})
+        self.check_playback_profiles(playback_profiles)
         filled_config_dict = self.fill(config_dict, default_config)
+        filled_config_dict["player"]["playback_profiles"] = dict(default_config["player"]["playback_profiles"], **playback_profiles)
         types_dict = self.get_types_dict(default_config)
+        del types_dict["player"]["playback_profiles"]
         types_dict["teamtalk"]["channel"] = (int, str)
         types_dict["logger"]["mode"] = (int, str)
+        types_dict["player"]["crossfade"] = (int, float)
+        types_dict["player"]["stall_timeout"] = (int, float)
+        types_dict["teamtalk"]["messages_per_second"] = (int, float)
         self.check_types(filled_config_dict, types_dict)
         super().__init__(filled_config_dict)
 
@@ -115,6 +164,14 @@ class Config(dict):
             elif not type(data[key]) in template[key]:
                 sys.exit("Invalid type: \"{}\" param in config must be {} not {}".format(key, " or ".join([type_names_dict[i] for i in template[key]]), type_names_dict[type(data[key])]))
 
+    def check_playback_profiles(self, profiles):
+        if type(profiles) != dict or not all(type(profile) == dict for profile in profiles.values()):
+            sys.exit("Invalid type: \"playback_profiles\" param in config must be a dictionary of dictionaries")
+        for name, profile in profiles.items():
+            for option, value in profile.items():
+                if type(value) not in (str, int, float, bool):
+                    sys.exit("Invalid type: \"{}\" option of \"{}\" playback profile must be string, integer, float or boolean".format(option, name))
+
     def fill(self, data, template):
         result = {}
         for key in template:
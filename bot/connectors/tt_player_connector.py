@@ -1,9 +1,7 @@
 import logging
 from threading import Thread
-import time
 
 from bot.player import State
-from bot import vars
 
 
 class TTPlayerConnector(Thread):
@@ -12,37 +10,44 @@ class TTPlayerConnector(Thread):
         self.name = 'TTPlayerConnector'
         self.player = player
         self.ttclient = ttclient
+        self._events = self.player.subscribe()
 
     def run(self):
-        last_player_state = State.Stopped
-        last_track_meta = {'name': None, 'url': None}
-        self._close = False
-        while not self._close:
+        is_transmitting = False
+        last_status_text = ''
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            event_type, player_state, track_meta = event
             try:
-                if self.player.state != last_player_state:
-                    last_player_state = self.player.state
-                    if self.player.state == State.Playing:
+                # Loading and buffering keep transmission on, so switching tracks does not toggle it
+                if (player_state in (State.Loading, State.Playing, State.Buffering)) != is_transmitting:
+                    is_transmitting = not is_transmitting
+                    if is_transmitting:
                         self.ttclient.enable_voice_transmission()
-                        last_track_meta = self.player.track.get_meta()
-                        if self.player.track.name:
-                            self.ttclient.change_status_text(_('Playing: {track_name}').format(track_name=self.player.track.name))
-                        else:
-                            self.ttclient.change_status_text(_('Playing: {stream_url}').format(stream_url=self.player.track.url))
-                    elif self.player.state == State.Stopped:
+                    else:
                         self.ttclient.disable_voice_transmission()
-                        self.ttclient.change_status_text('')
-                    elif self.player.state == State.Paused:
-                        self.ttclient.disable_voice_transmission()
-                        if self.player.track.name:
-                            self.ttclient.change_status_text(_('Paused: {track_name}').format(track_name=self.player.track.name))
-                        else:
-                            self.ttclient.change_status_text(_('Paused: {stream_url}').format(stream_url=self.player.track.url))
-                if self.player.track.get_meta() != last_track_meta and last_player_state != State.Stopped:
-                    last_track_meta = self.player.track.get_meta()
-                    self.ttclient.change_status_text('{state}: {name}'.format(state=self.ttclient.status.split(':')[0], name=self.player.track.name))
-            except Exception as e:
-                logging.error(exc_info=True)
-            time.sleep(vars.loop_timeout)
+                status_text = self.get_status_text(player_state, track_meta)
+                if status_text != last_status_text:
+                    last_status_text = status_text
+                    self.ttclient.change_status_text(status_text)
+            except Exception:
+                logging.error('', exc_info=True)
+
+    def get_status_text(self, player_state, track_meta):
+        if player_state in (State.Loading, State.Playing, State.Buffering):
+            if track_meta['name']:
+                return _('Playing: {track_name}').format(track_name=track_meta['name'])
+            else:
+                return _('Playing: {stream_url}').format(stream_url=track_meta['url'])
+        elif player_state == State.Paused:
+            if track_meta['name']:
+                return _('Paused: {track_name}').format(track_name=track_meta['name'])
+            else:
+                return _('Paused: {stream_url}').format(stream_url=track_meta['url'])
+        return ''
 
     def close(self):
-        self._close = True
+        self.player.unsubscribe(self._events)
+        self._events.put(None)
@@ -64,3 +64,11 @@ class LoginError(Exception):
 
 class JoinChannelError(Exception):
     pass
+
+
+class CommandError(Exception):
+    pass
+
+
+class StateTransitionError(Exception):
+    pass
@@ -0,0 +1,100 @@
+from collections import deque
+import logging
+from threading import Event, Lock, Thread
+
+from bot import vars
+
+
+class Counter:
+    def __init__(self):
+        self._lock = Lock()
+        self.value = 0
+
+    def increment(self, value=1):
+        with self._lock:
+            self.value += value
+
+    def __str__(self):
+        return str(self.value)
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
+
+
+class Histogram:
+    def __init__(self, size=vars.metrics_window):
+        self._lock = Lock()
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+
+    def percentiles(self, *percents):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return [0 for i in percents]
+        return [samples[min(len(samples) - 1, int(len(samples) * percent / 100))] for percent in percents]
+
+    def __str__(self):
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return 'n={count} p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms'.format(count=self.count, p50=p50 * 1000, p95=p95 * 1000, p99=p99 * 1000)
+
+
+_lock = Lock()
+_metrics = {}
+
+
+def _get(name, metric_class):
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = metric_class()
+        return _metrics[name]
+
+
+def counter(name):
+    return _get(name, Counter)
+
+
+def gauge(name):
+    return _get(name, Gauge)
+
+
+def histogram(name):
+    return _get(name, Histogram)
+
+
+def summary():
+    with _lock:
+        metrics = sorted(_metrics.items())
+    return ['{name}: {value}'.format(name=name, value=metric) for name, metric in metrics]
+
+
+class MetricsReporter(Thread):
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.name = 'MetricsReporter'
+        self.interval = interval
+        self._close = Event()
+
+    def run(self):
+        if self.interval <= 0:
+            return
+        while not self._close.wait(self.interval):
+            lines = summary()
+            if lines:
+                logging.info('Metrics: {}'.format('; '.join(lines)))
+
+    def close(self):
+        self._close.set()
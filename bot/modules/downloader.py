@@ -1,15 +1,15 @@
+from concurrent.futures import TimeoutError
 import logging
 import threading
 import time
 import os
 import tempfile
-from queue import Empty
 from urllib import request
 
 
 from bot.player.enums import TrackType
 from bot.TeamTalk.structs import ErrorType
-from bot import utils, vars
+from bot import errors, utils, vars
 
 
 class Downloader:
@@ -34,28 +34,22 @@ class Downloader:
             os.rename(temp_file_name, file_path)
         else:
             file_path = track.url
-        command_id = self.ttclient.send_file(self.ttclient.channel.id, file_path)
-        file_name = os.path.basename(file_path)
-        while True:
-            try:
-                file = self.ttclient.uploaded_files_queue.get_nowait()
-                if file.name == file_name:
-                    break
-                else:
-                    self.ttclient.uploaded_files_queue.put(file)
-            except Empty:
-                pass
-            try:
-                error = self.ttclient.errors_queue.get_nowait()
-                if error.command_id == command_id and error.type == ErrorType.MaxDiskusageExceeded:
-                    self.ttclient.send_message(_("Error: {}").format("Max diskusage exceeded"), user)
-                    error_exit = True
-                else:
-                    self.ttclient.errors_queue.put(error)
-            except Empty:
-                pass
-            time.sleep(vars.loop_timeout)
-        time.sleep(vars.loop_timeout)
+        try:
+            future = self.ttclient.send_file(self.ttclient.channel.id, file_path)
+            file = future.result(timeout=vars.file_upload_timeout)
+        except TimeoutError:
+            self.ttclient.command_registry.discard(future)
+            self.ttclient.send_message(_("Error: {}").format(_("Cannot upload file to channel")), user)
+            error_exit = True
+        except errors.CommandError as e:
+            error = e.args[0] if e.args else None
+            if error and error.type == ErrorType.MaxDiskusageExceeded:
+                self.ttclient.send_message(_("Error: {}").format("Max diskusage exceeded"), user)
+            else:
+                self.ttclient.send_message(_("Error: {}").format(error.message if error else _("Cannot upload file to channel")), user)
+            error_exit = True
+        except errors.ConnectionError:
+            error_exit = True
         if track.type == TrackType.Default:
             temp_dir.cleanup()
         if error_exit:
@@ -1,15 +1,22 @@
 from collections import deque
 import html
 import logging
+import queue
 import time
-import random
 import sys
+from threading import RLock
 
 import mpv
 
-from bot import errors, vars
-from bot.player.enums import Mode, State, TrackType
+from bot import errors, metrics, vars
+from bot.player.enums import FadingCurve, Mode, PlayerEvent, State, TrackType
+from bot.player.fader import Fader
+from bot.player.prefetcher import Prefetcher
+from bot.player.properties import PropertyMirror
+from bot.player.shuffle import Shuffle
 from bot.player.track import Track
+from bot.player.track_list import TrackList
+from bot.player.watchdog import StallWatchdog
 from bot.sound_devices import SoundDevice, SoundDeviceType
 
 
@@ -23,12 +30,43 @@ class Player:
         self.volume_fading = self.config['volume_fading']
         self.volume_fading_interval = self.config['volume_fading_interval']
         self.seek_step = config['seek_step']
-        self.track_list = []
+        # loadfile passes per-file options as text, and mpv spells booleans as yes and no
+        self.playback_profiles = {name: {option: ('yes' if value else 'no') if isinstance(value, bool) else str(value) for option, value in profile.items()} for name, profile in config['playback_profiles'].items()}
+        self.track_list = TrackList()
         self.track = Track()
         self.track_index = -1
-        self.state = State.Stopped
-        self.mode = Mode.TrackList
+        self._subscribers = []
+        self._state = State.Stopped
+        self.transitions = {
+            State.Stopped: {State.Loading},
+            State.Loading: {State.Playing, State.Paused, State.Buffering, State.Stopped},
+            State.Playing: {State.Loading, State.Paused, State.Buffering, State.Stopped},
+            State.Paused: {State.Loading, State.Playing, State.Stopped},
+            State.Buffering: {State.Loading, State.Playing, State.Paused, State.Stopped},
+        }
+        self.transition_log = deque(maxlen=vars.player_transition_log_size)
+        self._metadata = None
+        self._media_title = None
+        self._mode = Mode.TrackList
+        self._shuffle = None
         self.cache = cache
+        self.prefetcher = Prefetcher(self, self.config['prefetch_tracks'])
+        self._gap_start_time = None
+        self._load_start_time = None
+        self.crossfade = self.config['crossfade']
+        self.gapless = self.config['gapless'] and not self.crossfade
+        self._lock = RLock()
+        self._playlist = []
+        if self.gapless:
+            self._player.prefetch_playlist = True
+            self._player.gapless_audio = 'yes'
+        self._instances = [self._player]
+        if self.crossfade:
+            self._fade_player = mpv.MPV(**self.config["player_options"], log_handler=self.log_handler)
+            self._instances.append(self._fade_player)
+        self._mirrors = {instance: PropertyMirror(('time-pos', 'duration', 'speed', 'volume', 'pause', 'idle-active', 'metadata', 'paused-for-cache', 'demuxer-cache-duration', 'demuxer-cache-state')) for instance in self._instances}
+        self.fader = Fader(self.volume_fading_interval, FadingCurve(self.config['volume_fading_curve']))
+        self.watchdog = StallWatchdog(self, self.config)
 
     def initialize(self):
         logging.debug('Initializing player')
@@ -36,117 +74,450 @@ class Player:
 
     def run(self):
         logging.debug('Registering callbacks')
+        for instance, mirror in self._mirrors.items():
+            mirror.observe(instance)
         self.register_event_callback("end-file", self.on_end_file)
-        self.register_event_callback("metadata-update", self.on_metadata_update)
+        self.register_event_callback("playback-restart", self.on_playback_restart)
+        self.observe_property('metadata', self.on_metadata)
+        self.observe_property('media-title', self.on_metadata)
+        self.observe_property('pause', self.on_state_property)
+        self.observe_property('idle-active', self.on_state_property)
+        self.observe_property('paused-for-cache', self.on_paused_for_cache)
+        if self.gapless:
+            self.observe_property('playlist-pos', self.on_playlist_pos)
+        if self.crossfade:
+            self.observe_property('playtime-remaining', self.on_time_remaining)
         logging.debug('Callbacks registered')
+        self.prefetcher.start()
+        self.fader.start()
+        self.watchdog.start()
 
     def close(self):
         logging.debug('Closing player')
-        self._player.terminate()
+        self.prefetcher.close()
+        self.fader.close()
+        self.watchdog.close()
+        for instance in self._instances:
+            instance.terminate()
         logging.debug('Player closed')
 
     def play(self, tracks=None, start_track_index=None):
-        if tracks != None:
-            self.track_list = tracks
-            if not start_track_index and self.mode == Mode.Random:
-                self.shuffle(True)
-                self.track_index = self._index_list[0]
-                self.track = self.track_list[self.track_index]
+        with self._lock:
+            if tracks != None:
+                track = self._select_track_list(tracks, start_track_index)
+            elif self.state == State.Stopped:
+                raise errors.NothingIsPlayingError()
             else:
-                self.track_index = start_track_index if start_track_index else 0
-                self.track = tracks[self.track_index]
-            self._play(self.track.url)
+                self._player.pause = False
+                self._set_state(State.Playing, 'resumed')
+                self.fader.cancel(self._player)
+                self._player.volume = self.volume
+                return
+        self._start(track)
+
+    def _select_track_list(self, tracks, start_track_index=None):
+        # Replaces the track list and makes its first track current. The caller holds the lock and then starts it with _start
+        self.track_list = TrackList(tracks)
+        if self.mode == Mode.Random:
+            self._shuffle = Shuffle(len(self.track_list))
+        if not start_track_index and self.mode == Mode.Random:
+            self._set_track(self._shuffle.next())
         else:
-            self._player.pause = False
-        self._player.volume = self.volume
-        self.state = State.Playing
+            self._set_track(start_track_index if start_track_index else 0)
+        return self.track
+
+    def _start(self, track):
+        if self._load(track):
+            with self._lock:
+                self.fader.cancel(self._player)
+                self._player.volume = self.volume
 
     def pause(self):
-        self.state = State.Paused
-        self._player.pause = True
+        with self._lock:
+            if self.state == State.Stopped:
+                raise errors.NothingIsPlayingError()
+            self._set_state(State.Paused, 'paused')
+            self._stop_crossfade()
+            self._player.pause = True
 
     def stop(self):
-        self.state = State.Stopped
-        self._player.stop()
-        self.track_list = []
-        self.track = Track()
-        self.track_index = -1
+        with self._lock:
+            self._set_state(State.Stopped, 'stopped')
+            self._stop_crossfade()
+            self._player.stop()
+            self._playlist = []
+            self.track_list = TrackList()
+            self.track = Track()
+            self.track_index = -1
+            self._gap_start_time = None
+            self._update_upcoming()
 
     def _play(self, arg, save_to_recents=True):
         if save_to_recents:
-            try:
-                if self.cache.recents[-1] != self.track_list[self.track_index]:
-                    self.cache.recents.append(self.track_list[self.track_index])
-            except:
-                self.cache.recents.append(self.track_list[self.track_index])
-            self.cache.save()
+            self._save_to_recents()
         self._player.pause = False
-        self._player.play(arg)
+        self._set_state(State.Loading, 'loading track {}'.format(self.track_index + 1))
+        self._load_start_time = time.monotonic()
+        self._player.loadfile(arg, **self.get_playback_profile(self.track))
+        self._playlist = [(self.track_index, self.track)]
+        self._publish(PlayerEvent.MetadataChanged)
+        self._update_upcoming()
+
+    def _load(self, track):
+        # Resolving can ask a service for several seconds, so it happens outside the lock.
+        # Returns False when another track was chosen in the meantime
+        self.prefetcher.wait(track)
+        url = track.url
+        with self._lock:
+            if track is not self.track:
+                return False
+            self._play(url)
+            return True
+
+    def _save_to_recents(self):
+        try:
+            if self.cache.recents[-1] != self.track_list[self.track_index]:
+                self.cache.recents.append(self.track_list[self.track_index])
+        except:
+            self.cache.recents.append(self.track_list[self.track_index])
+        self.cache.save()
+
+    def _update_upcoming(self):
+        self.prefetcher.invalidate()
+        if self.gapless:
+            self._update_playlist()
+
+    def _update_playlist(self):
+        with self._lock:
+            if not self._playlist:
+                return
+            upcoming_indexes = self.get_upcoming_indexes(1)
+            upcoming_track = self.track_list[upcoming_indexes[0]] if upcoming_indexes else None
+            next_entry = self._playlist[1] if len(self._playlist) > 1 else None
+            if upcoming_track is not None and next_entry and next_entry[1] is upcoming_track:
+                return
+            # Drops everything but the current file, which keeps playing
+            self._player.playlist_clear()
+            self._playlist = self._playlist[:1]
+            # Truth-testing a track resolves it; unresolved ones are appended once the prefetcher is done with them
+            if upcoming_track is not None and upcoming_track.type != TrackType.Dynamic:
+                self._player.loadfile(upcoming_track.url, 'append', **self.get_playback_profile(upcoming_track))
+                self._playlist.append((upcoming_indexes[0], upcoming_track))
+
+    def on_time_remaining(self, name, time_remaining):
+        with self._lock:
+            if time_remaining is None or time_remaining > self.crossfade or self.state != State.Playing:
+                return
+            if self.mode not in (Mode.TrackList, Mode.RepeatTrackList, Mode.Random) or (self.properties.get('duration') or 0) < self.crossfade * 2:
+                return
+            upcoming_indexes = self.get_upcoming_indexes(1)
+            if not upcoming_indexes or self.track_list[upcoming_indexes[0]].type == TrackType.Dynamic:
+                return
+            track = self.track_list[upcoming_indexes[0]]
+            fading_player = self._player
+            self._player, self._fade_player = self._fade_player, self._player
+            self._player.speed = self._mirrors[fading_player].get('speed')
+            self._player.volume = 0
+            self._set_track(upcoming_indexes[0])
+            self._play(track.url)
+            self.fader.fade(fading_player, self._mirrors[fading_player].get('volume'), 0, time_remaining, on_done=fading_player.stop)
+            self.fader.fade(self._player, 0, self.volume, time_remaining)
+
+    def _stop_crossfade(self):
+        if self.crossfade:
+            self.fader.cancel(self._fade_player)
+            self._fade_player.stop()
+            self.fader.cancel(self._player)
+            self._player.volume = self.volume
+
+    def on_track_prefetched(self, track):
+        with self._lock:
+            if self.gapless:
+                self._update_playlist()
+
+    def on_playlist_pos(self, name, position):
+        with self._lock:
+            if not position or position >= len(self._playlist) or self.state == State.Stopped:
+                return
+            self._set_track(self._playlist[position][0])
+            self._playlist = self._playlist[position:position + 1]
+            self._player.playlist_clear()
+            self._save_to_recents()
+            self._publish(PlayerEvent.MetadataChanged)
+            self._update_upcoming()
 
     def next(self):
+        with self._lock:
+            track = self._select_next()
+        self._load(track)
+
+    def _select_next(self):
         track_index = self.track_index
         if len(self.track_list) > 0:
             if self.mode == Mode.Random:
-                try:
-                    track_index = self._index_list[self._index_list.index(self.track_index) + 1]
-                except IndexError:
-                    track_index = 0
+                track_index = self._shuffle.next()
             else:
                 track_index += 1
         else:
             track_index = 0
         try:
-            self.play_by_index(track_index)
+            return self._select(track_index)
         except errors.IncorrectTrackIndexError:
             if self.mode == Mode.RepeatTrackList:
-                self.play_by_index(0)
+                return self._select(0)
             else:
                 raise errors.NoNextTrackError()
 
     def previous(self):
-        track_index = self.track_index
-        if len(self.track_list) > 0:
-            if self.mode == Mode.Random:
-                try:
-                    track_index = self._index_list[self._index_list.index(self.track_index) - 1]
-                except IndexError:
-                    track_index = len(self.track_list) - 1
-            else:
-                track_index -= 1
-        else:
-            track_index = 0
-        try:
-            self.play_by_index(track_index)
-        except errors.IncorrectTrackIndexError:
-            if self.mode == Mode.RepeatTrackList:
-                self.play_by_index(len(self.track_list) - 1)
+        with self._lock:
+            track_index = self.track_index
+            if len(self.track_list) > 0:
+                if self.mode == Mode.Random:
+                    track_index = self._shuffle.previous()
+                    if track_index is None:
+                        raise errors.NoPreviousTrackError()
+                else:
+                    track_index -= 1
             else:
-                raise errors.NoPreviousTrackError
+                track_index = 0
+            try:
+                track = self._select(track_index)
+            except errors.IncorrectTrackIndexError:
+                if self.mode == Mode.RepeatTrackList:
+                    track = self._select(len(self.track_list) - 1)
+                else:
+                    raise errors.NoPreviousTrackError
+        self._load(track)
 
     def play_by_index(self, index):
+        with self._lock:
+            track = self._select(index)
+        self._load(track)
+
+    def _select(self, index):
+        # Makes the track at index current. The caller holds the lock and then loads it with _load
         if self.state == State.Stopped:
             raise errors.NothingIsPlayingError()
-        if index < len(self.track_list) and index >= (0 - len(self.track_list)):
-            self.track = self.track_list[index]
-            self.track_index = self.track_list.index(self.track)
-            self._play(self.track.url)
-            self.state = State.Playing
-        else:
+        if not (index < len(self.track_list) and index >= (0 - len(self.track_list))):
             raise errors.IncorrectTrackIndexError()
+        self._set_track(index)
+        return self.track
+
+    def _set_track(self, index):
+        # Every change of the current track goes through here, so the shuffle order follows it
+        self.track_index = index % len(self.track_list)
+        self.track = self.track_list[self.track_index]
+        if self.mode == Mode.Random and self._shuffle.current != self.track_index:
+            self._shuffle.seek(self.track_index)
+
+    def reload(self, track, refresh=False):
+        if refresh:
+            try:
+                # Outside the lock: this asks the service again
+                if track.refresh():
+                    logging.info('Got a new stream URL for {}'.format(track.get_cached_meta()['name']))
+            except Exception:
+                logging.warning('Cannot resolve a stalled track again', exc_info=True)
+        with self._lock:
+            if track is not self.track or self.state not in (State.Loading, State.Playing, State.Buffering):
+                return
+            self._play(track.url, save_to_recents=False)
+
+    def skip(self, track):
+        # Moves on from track, unless another track was chosen in the meantime
+        with self._lock:
+            if track is not self.track or self.state == State.Stopped:
+                return
+            try:
+                next_track = self._select_next()
+            except errors.NoNextTrackError:
+                self.stop()
+                return
+        self._load(next_track)
+
+    def get_playback_profile(self, track):
+        # Options that mpv applies to this file only, tuned for the kind of source
+        return self.playback_profiles.get(track.type.name.lower(), self.playback_profiles.get('default', {}))
+
+    def get_upcoming_tracks(self, count):
+        return [self.track_list[i] for i in self.get_upcoming_indexes(count)]
+
+    def get_upcoming_indexes(self, count):
+        with self._lock:
+            if not self.track_list or self.mode in (Mode.SingleTrack, Mode.RepeatTrack) or self.track.type == TrackType.Direct:
+                return []
+            if self.mode == Mode.Random:
+                return self._shuffle.peek(count) if self._shuffle else []
+            elif self.mode == Mode.RepeatTrackList:
+                return [i % len(self.track_list) for i in range(self.track_index + 1, self.track_index + 1 + count)]
+            else:
+                return list(range(self.track_index + 1, min(self.track_index + 1 + count, len(self.track_list))))
+
+    def enqueue(self, tracks):
+        with self._lock:
+            if self.state == State.Stopped:
+                track = self._select_track_list(tracks)
+            else:
+                index = len(self.track_list)
+                self.track_list.extend(tracks)
+                if self._shuffle:
+                    self._shuffle.append(len(tracks))
+                self._update_upcoming()
+                return index
+        self._start(track)
+        return 0
+
+    def enqueue_next(self, tracks):
+        with self._lock:
+            if self.state == State.Stopped:
+                track = self._select_track_list(tracks)
+            else:
+                index = self.track_index + 1
+                count = len(tracks)
+                self.track_list.insert(index, tracks)
+                self._remap(lambda i: i + count if i >= index else i)
+                if self._shuffle:
+                    for i in reversed(range(index, index + count)):
+                        self._shuffle.queue(i)
+                self._update_upcoming()
+                return index
+        self._start(track)
+        return 0
+
+    def move_track(self, source, target):
+        with self._lock:
+            if not (0 <= source < len(self.track_list) and 0 <= target < len(self.track_list)):
+                raise errors.IncorrectTrackIndexError()
+            def mapping(i):
+                if i == source:
+                    return target
+                elif source < i <= target:
+                    return i - 1
+                elif target <= i < source:
+                    return i + 1
+                return i
+            self.track_list.move(source, target)
+            self._remap(mapping)
+            self._update_upcoming()
+
+    def remove_tracks(self, start, stop):
+        with self._lock:
+            if not 0 <= start < stop <= len(self.track_list):
+                raise errors.IncorrectTrackIndexError()
+            count = stop - start
+            self.track_list.remove(start, stop)
+            is_current_removed = start <= self.track_index < stop
+            self._remap(lambda i: None if start <= i < stop else i - count if i >= stop else i)
+            if is_current_removed:
+                self.track_index = start - 1
+            if not (is_current_removed and self.state != State.Stopped):
+                self._update_upcoming()
+                return
+            # The playing track is gone, so playback moves on to whatever followed it
+            try:
+                if not self.track_list:
+                    raise errors.NoNextTrackError()
+                track = self._select_next()
+            except errors.NoNextTrackError:
+                self.stop()
+                return
+        self._load(track)
+
+    def remove_duplicates(self):
+        with self._lock:
+            keys = {self.track.get_key()} if self.track_index >= 0 else set()
+            indexes = {}
+            tracks = []
+            for i, track in enumerate(self.track_list):
+                key = track.get_key()
+                if i != self.track_index and key in keys:
+                    continue
+                keys.add(key)
+                indexes[i] = len(tracks)
+                tracks.append(track)
+            count = len(self.track_list) - len(tracks)
+            if count:
+                self.track_list = TrackList(tracks)
+                self._remap(indexes.get)
+            self._update_upcoming()
+            return count
+
+    def _remap(self, mapping):
+        # Keeps every index into the track list in step with it. The caller holds the player lock
+        if mapping(self.track_index) is not None:
+            self.track_index = mapping(self.track_index)
+        self._playlist = [(mapping(index), track) for index, track in self._playlist if mapping(index) is not None]
+        if self._shuffle:
+            self._shuffle.remap(mapping, len(self.track_list))
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state, reason):
+        # The caller holds the player lock
+        if state == self._state:
+            return
+        if state not in self.transitions[self._state]:
+            raise errors.StateTransitionError('{} -> {}'.format(self._state.value, state.value))
+        self.transition_log.append((time.time(), self._state, state, reason))
+        logging.debug('Player state: {} -> {}: {}'.format(self._state.value, state.value, reason))
+        self._state = state
+        self._publish(PlayerEvent.StateChanged)
+
+    def subscribe(self):
+        events = queue.Queue()
+        self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        self._subscribers.remove(events)
+
+    def _publish(self, event_type):
+        # Events carry a snapshot, so subscribers never have to read the player or resolve the track
+        event = (event_type, self.state, self.track.get_cached_meta())
+        for events in list(self._subscribers):
+            events.put(event)
+
+    @property
+    def properties(self):
+        # Values observed on the audible instance, read without a round trip to libmpv
+        return self._mirrors[self._player]
+
+    def get_properties(self):
+        return self.properties.snapshot()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        with self._lock:
+            self._mode = mode
+            self._update_upcoming()
+
+    def set_mode(self, mode):
+        # Switches the mode and the shuffle together, so Random never runs without a shuffle
+        with self._lock:
+            if mode == Mode.Random:
+                self.shuffle(True)
+            elif self.mode == Mode.Random:
+                self.shuffle(False)
+            self.mode = mode
 
     def set_volume(self, volume):
         volume = volume if volume <= self.max_volume else self.max_volume
         self.volume = volume
         if self.volume_fading:
-            n = 1 if self._player.volume < volume else -1
-            for i in range(int(self._player.volume), volume, n):
-                self._player.volume = i
-                time.sleep(self.volume_fading_interval)
+            current_volume = self.properties.get('volume')
+            self.fader.fade(self._player, current_volume, volume, abs(volume - current_volume) * self.volume_fading_interval)
         else:
+            self.fader.cancel(self._player)
             self._player.volume = volume
 
     def get_speed(self):
-        return self._player.speed
+        return self.properties.get('speed')
 
     def set_speed(self, arg):
         if arg < 0.25 or arg > 4:
@@ -172,12 +543,12 @@ class Player:
     def get_duration(self):
         if self.state == State.Stopped:
             raise errors.NothingIsPlayingError()
-        return self._player.duration
+        return self.properties.get('duration')
 
     def get_position(self):
         if self.state == State.Stopped:
             raise errors.NothingIsPlayingError()
-        return self._player.time_pos
+        return self.properties.get('time-pos')
 
     def set_position(self, arg):
         if arg < 0:
@@ -191,17 +562,32 @@ class Player:
         return devices
 
     def set_output_device(self, id):
-        self._player.audio_device = id
+        for instance in self._instances:
+            instance.audio_device = id
 
     def shuffle(self, enable):
-        if enable:
-            self._index_list = [i for i in range(0, len(self.track_list))]
-            random.shuffle(self._index_list)
-        else:
-            del self._index_list
+        with self._lock:
+            if enable:
+                self._shuffle = Shuffle(len(self.track_list))
+                if self.track_list and self.track_index >= 0:
+                    self._shuffle.seek(self.track_index)
+            else:
+                self._shuffle = None
 
     def register_event_callback(self, callback_name, callback_func):
-        self._player.event_callback(callback_name)(callback_func)
+        for instance in self._instances:
+            instance.event_callback(callback_name)(self._filter_instance(instance, callback_func))
+
+    def observe_property(self, name, handler):
+        for instance in self._instances:
+            instance.observe_property(name, self._filter_instance(instance, handler))
+
+    def _filter_instance(self, instance, callback_func):
+        # Only the instance that is currently audible drives the player
+        def callback(*args):
+            if instance is self._player:
+                callback_func(*args)
+        return callback
 
     def log_handler(self, level, component, message):
         level = logging.getLevelName(self._log_level)
@@ -226,25 +612,59 @@ class Player:
         return " - ".join(chunks)
 
     def on_end_file(self, event):
-            if self.state == State.Playing and self._player.idle_active:
+            with self._lock:
+                if self.state in (State.Loading, State.Playing, State.Buffering):
+                    self._gap_start_time = time.monotonic()
+                # Read from libmpv: the observed idle-active only changes after end-file is delivered
+                if self.state not in (State.Loading, State.Playing, State.Buffering) or not self._player.idle_active:
+                    return
+                if not self._playlist or self._playlist[0][1] is not self.track:
+                    # Another track is being resolved and will replace the one that ended
+                    return
                 if self.mode == Mode.SingleTrack or self.track.type == TrackType.Direct:
                     self.stop()
-                elif self.mode == Mode.RepeatTrack:
+                    return
+                if self.mode == Mode.RepeatTrack:
+                    # Already resolved, so replaying it does not block the lock
                     self.play_by_index(self.track_index)
+                    return
+                track = self.track
+            self.skip(track)
+
+    def on_playback_restart(self, event):
+        with self._lock:
+            if self._gap_start_time:
+                metrics.histogram('player.gap').add(time.monotonic() - self._gap_start_time)
+                self._gap_start_time = None
+            if self.state == State.Loading:
+                metrics.histogram('player.startup.{}'.format(self.track.type.name.lower())).add(time.monotonic() - self._load_start_time)
+                self._set_state(State.Playing, 'playback started')
+
+    def on_paused_for_cache(self, name, value):
+        with self._lock:
+            if value and self.state == State.Playing:
+                self._set_state(State.Buffering, 'waiting for the cache')
+            elif not value and self.state == State.Buffering:
+                self._set_state(State.Playing, 'cache filled')
+
+    def on_metadata(self, name, value):
+            with self._lock:
+                if name == 'metadata':
+                    self._metadata = value
                 else:
+                    self._media_title = value
+                if self.state in (State.Loading, State.Playing, State.Buffering) and (self.track.type == TrackType.Direct or self.track.type == TrackType.Local):
                     try:
-                        self.next()
-                    except errors.NoNextTrackError:
-                        self.stop()
-
-    def on_metadata_update(self, event):
-            if self.state == State.Playing and (self.track.type == TrackType.Direct or self.track.type == TrackType.Local):
-                metadata = self._player.metadata
-                try:
-                    new_name = self._parse_metadata(metadata)
-                    if not new_name:
-                        new_name = html.unescape(self._player.media_title)
-                except TypeError:
-                    new_name = html.unescape(self._player.media_title)
-                if self.track.name != new_name and new_name:
-                    self.track.name = new_name
+                        new_name = self._parse_metadata(self._metadata)
+                        if not new_name:
+                            new_name = html.unescape(self._media_title)
+                    except TypeError:
+                        new_name = html.unescape(self._media_title) if self._media_title else None
+                    if self.track.name != new_name and new_name:
+                        self.track.name = new_name
+                        self._publish(PlayerEvent.MetadataChanged)
+
+    def on_state_property(self, name, value):
+        with self._lock:
+            # mpv applies pausing and loading asynchronously, so subscribers get the state again once it has settled
+            self._publish(PlayerEvent.StateChanged)
@@ -3,8 +3,10 @@ from enum import Enum
 
 class State(Enum):
     Stopped = 'Stopped'
+    Loading = 'Loading'
     Playing = 'Playing'
     Paused = 'Paused'
+    Buffering = 'Buffering'
 
 
 class Mode(Enum):
@@ -21,3 +23,13 @@ class TrackType(Enum):
     Local = 2
     Direct = 3
     Dynamic = 4
+
+
+class FadingCurve(Enum):
+    Linear = 'linear'
+    Logarithmic = 'logarithmic'
+
+
+class PlayerEvent(Enum):
+    StateChanged = 0
+    MetadataChanged = 1
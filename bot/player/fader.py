@@ -0,0 +1,73 @@
+import math
+from threading import Condition, Thread
+import time
+
+from bot.player.enums import FadingCurve
+
+
+class Ramp:
+    def __init__(self, start, end, duration, curve, on_done=None):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.curve = curve
+        self.on_done = on_done
+        self.start_time = time.monotonic()
+
+    def get_value(self, now):
+        if self.duration <= 0:
+            return self.end
+        progress = min((now - self.start_time) / self.duration, 1)
+        if self.curve == FadingCurve.Logarithmic:
+            # Equal steps in loudness rather than in volume; the offset keeps zero reachable
+            start, end = math.log(self.start + 1), math.log(self.end + 1)
+            return math.exp(start + (end - start) * progress) - 1
+        return self.start + (self.end - self.start) * progress
+
+    def is_done(self, now):
+        return now - self.start_time >= self.duration
+
+
+class Fader(Thread):
+    def __init__(self, interval, curve=FadingCurve.Linear):
+        super().__init__(daemon=True)
+        self.name = 'FaderThread'
+        self.interval = interval
+        self.curve = curve
+        self._condition = Condition()
+        self._ramps = {}
+        self._close = False
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._ramps or self._close)
+                if self._close:
+                    break
+                now = time.monotonic()
+                finished = []
+                for instance, ramp in list(self._ramps.items()):
+                    instance.volume = ramp.get_value(now)
+                    if ramp.is_done(now):
+                        del self._ramps[instance]
+                        finished.append(ramp)
+            for ramp in finished:
+                if ramp.on_done:
+                    ramp.on_done()
+            with self._condition:
+                if self._ramps and not self._close:
+                    self._condition.wait(self.interval)
+
+    def fade(self, instance, start, end, duration, on_done=None):
+        with self._condition:
+            self._ramps[instance] = Ramp(start, end, duration, self.curve, on_done)
+            self._condition.notify_all()
+
+    def cancel(self, instance):
+        with self._condition:
+            self._ramps.pop(instance, None)
+
+    def close(self):
+        with self._condition:
+            self._close = True
+            self._condition.notify_all()
@@ -0,0 +1,61 @@
+import logging
+from threading import Condition, Thread
+import time
+
+from bot import metrics
+from bot.player.enums import TrackType
+
+
+class Prefetcher(Thread):
+    def __init__(self, player, count):
+        super().__init__(daemon=True)
+        self.name = 'PrefetcherThread'
+        self.player = player
+        self.count = count
+        self._condition = Condition()
+        self._pending = []
+        self._fetching = None
+        self._close = False
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._close)
+                if self._close:
+                    break
+                track = self._pending.pop(0)
+                self._fetching = track
+            start_time = time.monotonic()
+            try:
+                track.url
+                metrics.histogram('player.prefetch.time').add(time.monotonic() - start_time)
+            except Exception:
+                metrics.counter('player.prefetch.errors').increment()
+                logging.warning('Cannot prefetch a track', exc_info=True)
+                continue
+            finally:
+                with self._condition:
+                    self._fetching = None
+                    self._condition.notify_all()
+            # Only after waiters are released: the player may be holding its lock while it waits for this track
+            try:
+                self.player.on_track_prefetched(track)
+            except Exception:
+                logging.error('', exc_info=True)
+
+    def invalidate(self):
+        tracks = [track for track in self.player.get_upcoming_tracks(self.count) if track.type == TrackType.Dynamic] if self.count > 0 else []
+        with self._condition:
+            self._pending = tracks
+            self._condition.notify_all()
+
+    def wait(self, track):
+        with self._condition:
+            if track in self._pending:
+                self._pending.remove(track)
+            self._condition.wait_for(lambda: self._fetching is not track)
+
+    def close(self):
+        with self._condition:
+            self._close = True
+            self._condition.notify_all()
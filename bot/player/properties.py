@@ -0,0 +1,24 @@
+import threading
+
+
+class PropertyMirror:
+    def __init__(self, names):
+        self._lock = threading.Lock()
+        self.names = names
+        self._values = dict.fromkeys(names)
+
+    def observe(self, instance):
+        for name in self.names:
+            self._values[name] = getattr(instance, name.replace('-', '_'))
+            instance.observe_property(name, self.update)
+
+    def update(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name):
+        return self._values[name]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
@@ -0,0 +1,114 @@
+from collections import deque
+import random
+
+from bot import vars
+
+
+class Shuffle:
+    def __init__(self, length, no_repeat=vars.shuffle_no_repeat, history_size=vars.shuffle_history_size):
+        self.length = length
+        self.history = []
+        self.cursor = -1
+        self.history_size = history_size
+        self._recent = deque(maxlen=no_repeat)
+        self._drawn = 0
+        self._values = {}
+        self._slots = {}
+
+    @property
+    def current(self):
+        return self.history[self.cursor] if self.cursor >= 0 else None
+
+    def next(self):
+        if self.cursor + 1 == len(self.history):
+            if not self.length:
+                return None
+            self.history.append(self._draw())
+        self.cursor += 1
+        self._trim()
+        self._recent.append(self.current)
+        return self.current
+
+    def previous(self):
+        if self.cursor <= 0:
+            return None
+        self.cursor -= 1
+        return self.current
+
+    def peek(self, count):
+        while self.length and len(self.history) - self.cursor - 1 < count:
+            self.history.append(self._draw())
+        return self.history[self.cursor + 1:self.cursor + 1 + count]
+
+    def seek(self, index):
+        self.queue(index)
+        self.cursor += 1
+        self._trim()
+        self._recent.append(index)
+
+    def queue(self, index):
+        # Plans an explicitly chosen track next without disturbing the order planned after it
+        upcoming = self.history[self.cursor + 1:]
+        if index in upcoming:
+            del self.history[self.cursor + 1 + upcoming.index(index)]
+        elif self._get_slot(index) >= self._drawn:
+            self._swap(self._drawn, self._get_slot(index))
+            self._drawn += 1
+        self.history.insert(self.cursor + 1, index)
+
+    def append(self, count=1):
+        self.length += count
+
+    def remap(self, mapping, length):
+        # Follows tracks that were moved or removed; mapping returns None for removed ones
+        drawn = [mapping(self._values.get(slot, slot)) for slot in range(self._drawn)]
+        kept = [(position, mapping(index)) for position, index in enumerate(self.history)]
+        self.cursor = sum(1 for position, index in kept if index is not None and position <= self.cursor) - 1
+        self.history = [index for position, index in kept if index is not None]
+        recent = [mapping(index) for index in self._recent]
+        self._recent.clear()
+        self._recent.extend(index for index in recent if index is not None)
+        self.length = length
+        self._drawn = 0
+        self._values.clear()
+        self._slots.clear()
+        for index in drawn:
+            if index is not None:
+                self._swap(self._drawn, self._get_slot(index))
+                self._drawn += 1
+
+    def _draw(self):
+        if self._drawn >= self.length:
+            self._drawn = 0
+            self._values.clear()
+            self._slots.clear()
+        recent = ()
+        if self._drawn < len(self._recent):
+            # Later in a round every recent track is already drawn. At least one undrawn track must stay allowed
+            recent = list(self._recent)[max(len(self._recent) - (self.length - self._drawn - 1), 0):]
+        for i in range(len(recent) * 4 + 1):
+            slot = random.randrange(self._drawn, self.length)
+            if self._values.get(slot, slot) not in recent:
+                break
+        else:
+            slot = next(slot for slot in range(self._drawn, self.length) if self._values.get(slot, slot) not in recent)
+        value = self._values.get(slot, slot)
+        self._swap(self._drawn, slot)
+        self._drawn += 1
+        return value
+
+    def _get_slot(self, value):
+        return self._slots.get(value, value)
+
+    def _swap(self, first_slot, second_slot):
+        first_value = self._values.get(first_slot, first_slot)
+        second_value = self._values.get(second_slot, second_slot)
+        self._values[first_slot] = second_value
+        self._slots[second_value] = first_slot
+        self._values[second_slot] = first_value
+        self._slots[first_value] = second_slot
+
+    def _trim(self):
+        if self.cursor > self.history_size * 2:
+            del self.history[:self.history_size]
+            self.cursor -= self.history_size
@@ -1,26 +1,59 @@
+import sys
+
 from bot.player.enums import TrackType
 
 class Track:
-    def __init__(self, service=None, url=None, name=None, format=None, extra_info=None, type=TrackType.Default):
+    __slots__ = ('service', '_url', '_name', 'format', 'extra_info', 'type', '_is_fetched', '_origin')
+
+    def __init__(self, service=None, url=None, name=None, format=None, extra_info=None, type=TrackType.Default, origin=None):
         self.service = service
         self.url = url
         self.name = name
-        self.format = format
+        self.format = sys.intern(format) if format else format
         self.extra_info = extra_info
         self.type = type
         if service:
             self.type = TrackType.Dynamic
         self._is_fetched = False
+        # The service and the arguments that resolved this track, so it can be resolved again
+        self._origin = origin
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__ if hasattr(self, slot)}
+
+    def __setstate__(self, state):
+        # Caches written before Track had slots store a plain __dict__
+        if isinstance(state, tuple):
+            state = state[1]
+        self._origin = None
+        for slot, value in state.items():
+            if slot in self.__slots__:
+                setattr(self, slot, value)
+        if self.format:
+            self.format = sys.intern(self.format)
 
     def _fetch_stream_data(self):
         if (not self.service) or self._is_fetched:
             return
-        track = self.service.get(self._url, extra_info=self.extra_info)[0]
+        self._origin = (self.service, self._url, self.extra_info)
+        self._update(self.service.get(self._url, extra_info=self.extra_info)[0])
+        self.extra_info = None
+        self._is_fetched = True
+
+    def _update(self, track):
         self.url = track.url
         self.name = track.name
         self.format = track.format
         self.type = track.type
-        self._is_fetched = True
+
+    def refresh(self):
+        # Resolves the track again, e.g. when its stream URL has expired. Returns whether the URL changed
+        if not self._origin:
+            return False
+        service, url, extra_info = self._origin
+        old_url = self._url
+        self._update(service.get(url, extra_info=extra_info)[0])
+        return self._url != old_url
 
     @property
     def url(self):
@@ -40,11 +73,22 @@ class Track:
     def name(self, value):
         self._name = value
 
-    def get_meta(self):
-        try:
-            return {'name': self.name, 'url': self.url}
-        except:
-            return {'name': None, 'url': ''}
+    def get_key(self):
+        # Identifies a track without resolving it, and stays the same once it is resolved
+        service = self._origin[0] if self._origin else self.service
+        return (service.name if service else None, self.get_page_url())
+
+    def get_page_url(self):
+        # The URL the track was added with, not the stream URL it resolves to
+        if self._origin:
+            service, url, extra_info = self._origin
+        else:
+            url, extra_info = self._url, self.extra_info
+        return url or (extra_info.get('url') if extra_info else None)
+
+    def get_cached_meta(self):
+        # Never resolves the track
+        return {'name': self._name, 'url': self._url}
 
     def __bool__(self):
         if self.url or (self.service and self.extra_info):
@@ -0,0 +1,111 @@
+from bot import vars
+
+
+class TrackList:
+    def __init__(self, tracks=(), chunk_size=vars.track_list_chunk_size):
+        self.chunk_size = chunk_size
+        tracks = list(tracks)
+        self._chunks = [tracks[i:i + chunk_size] for i in range(0, len(tracks), chunk_size)]
+        self._length = len(tracks)
+        self._build_tree()
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __getitem__(self, index):
+        chunk_index, position = self._locate(index)
+        return self._chunks[chunk_index][position]
+
+    def append(self, track):
+        self.extend([track])
+
+    def extend(self, tracks):
+        self.insert(self._length, tracks)
+
+    def insert(self, index, tracks):
+        if not 0 <= index <= self._length:
+            raise IndexError('track list index out of range')
+        tracks = list(tracks)
+        if not tracks:
+            return
+        if not self._chunks:
+            self._chunks.append([])
+            self._build_tree()
+        if index == self._length:
+            chunk_index, position = len(self._chunks) - 1, len(self._chunks[-1])
+        else:
+            chunk_index, position = self._locate(index)
+        chunk = self._chunks[chunk_index]
+        chunk[position:position] = tracks
+        self._length += len(tracks)
+        if len(chunk) > self.chunk_size * 2:
+            self._chunks[chunk_index:chunk_index + 1] = [chunk[i:i + self.chunk_size] for i in range(0, len(chunk), self.chunk_size)]
+            self._build_tree()
+        else:
+            self._add(chunk_index, len(tracks))
+
+    def remove(self, start, stop):
+        if not 0 <= start < stop <= self._length:
+            raise IndexError('track list index out of range')
+        removed = []
+        chunk_index, position = self._locate(start)
+        first_chunk = chunk_index
+        while len(removed) < stop - start:
+            chunk = self._chunks[chunk_index]
+            end = min(len(chunk), position + stop - start - len(removed))
+            removed += chunk[position:end]
+            del chunk[position:end]
+            self._add(chunk_index, position - end)
+            chunk_index += 1
+            position = 0
+        self._length -= len(removed)
+        chunks = [chunk for chunk in self._chunks[first_chunk:chunk_index] if chunk]
+        # Merges a shrunk chunk into its neighbour so that chunks stay close to their size
+        if chunks and chunk_index < len(self._chunks) and len(chunks[-1]) + len(self._chunks[chunk_index]) <= self.chunk_size:
+            chunks[-1] += self._chunks[chunk_index]
+            chunk_index += 1
+        if len(chunks) != chunk_index - first_chunk:
+            self._chunks[first_chunk:chunk_index] = chunks
+            self._build_tree()
+        return removed
+
+    def move(self, source, target):
+        if not (0 <= source < self._length and 0 <= target < self._length):
+            raise IndexError('track list index out of range')
+        track = self.remove(source, source + 1)
+        self.insert(target, track)
+
+    def _locate(self, index):
+        # Walks the binary indexed tree of chunk lengths down to the chunk that holds the index
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('track list index out of range')
+        chunk_index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            if chunk_index + step < len(self._tree) and self._tree[chunk_index + step] <= index:
+                chunk_index += step
+                index -= self._tree[chunk_index]
+            step >>= 1
+        return chunk_index, index
+
+    def _add(self, chunk_index, delta):
+        chunk_index += 1
+        while chunk_index < len(self._tree):
+            self._tree[chunk_index] += delta
+            chunk_index += chunk_index & -chunk_index
+
+    def _build_tree(self):
+        self._tree = [0] + [len(chunk) for chunk in self._chunks]
+        for i in range(1, len(self._tree)):
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
@@ -0,0 +1,91 @@
+import logging
+from threading import Event, Thread
+import time
+
+from bot import metrics, vars
+from bot.player.enums import State, TrackType
+
+
+class StallWatchdog(Thread):
+    def __init__(self, player, config):
+        super().__init__(daemon=True)
+        self.name = 'StallWatchdogThread'
+        self.player = player
+        self.timeout = config['stall_timeout']
+        self.max_reconnects = config['stall_max_reconnects']
+        self._close = Event()
+        self._reset(None, 0)
+
+    def run(self):
+        if self.timeout <= 0:
+            return
+        while not self._close.wait(vars.stall_check_interval):
+            try:
+                self.check()
+            except Exception:
+                logging.error('', exc_info=True)
+
+    def check(self):
+        now = time.monotonic()
+        track = self.player.track
+        if self.player.state not in (State.Loading, State.Playing, State.Buffering):
+            self._reset(None, now)
+            return
+        properties = self.player.get_properties()
+        cache_duration = properties['demuxer-cache-duration'] or 0
+        metrics.gauge('player.cache.duration').set('{:.1f}'.format(cache_duration))
+        cache_state = properties['demuxer-cache-state'] or {}
+        metrics.gauge('player.cache.bytes.{}'.format(track.type.name.lower())).set(cache_state.get('total-bytes', 0))
+        if track.type not in (TrackType.Live, TrackType.Direct):
+            self._reset(None, now)
+            return
+        if track is not self._track:
+            self._reset(track, now)
+        position = properties['time-pos']
+        if position is not None and (self._position is None or position < self._position):
+            # A new baseline after loading or seeking back
+            self._position = position
+        # Either playback moves or mpv is still receiving data while it waits for the cache
+        is_progressing = (position is not None and position > self._position) or (properties['paused-for-cache'] and cache_duration > self._cache_duration)
+        self._cache_duration = cache_duration
+        if is_progressing:
+            self._position = position
+            self._progress_time = now
+            if self._stall_time is not None:
+                metrics.histogram('player.stall.duration').add(now - self._stall_time)
+                logging.info('Stream recovered after {:.1f} s'.format(now - self._stall_time))
+                self._stall_time = None
+                self._attempts = 0
+            return
+        if now - self._progress_time < self.timeout or now < self._retry_time:
+            return
+        if self._stall_time is None:
+            self._stall_time = self._progress_time
+            metrics.counter('player.stall.count').increment()
+            logging.warning('Stream stalled: {}'.format(track.get_cached_meta()['url']))
+        if self._attempts >= self.max_reconnects >= 0:
+            logging.error('Stream did not recover after {} reconnects'.format(self._attempts))
+            metrics.histogram('player.stall.duration').add(now - self._stall_time)
+            self._reset(None, now)
+            self.player.skip(track)
+            return
+        delay = min(vars.stall_reconnect_max_delay, vars.stall_reconnect_initial_delay * 2 ** min(self._attempts, 16))
+        self._attempts += 1
+        self._retry_time = now + delay
+        metrics.counter('player.stall.reconnects').increment()
+        # A reconnect to the same URL comes first, later attempts ask the service for a fresh one
+        self.player.reload(track, refresh=self._attempts > 1)
+        self._position = None
+        self._progress_time = time.monotonic()
+
+    def _reset(self, track, now):
+        self._track = track
+        self._position = None
+        self._cache_duration = 0
+        self._progress_time = now
+        self._stall_time = None
+        self._retry_time = 0
+        self._attempts = 0
+
+    def close(self):
+        self._close.set()
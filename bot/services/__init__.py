@@ -5,12 +5,14 @@ from bot.services import vk, yt
 
 
 class ServiceManager:
-    def __init__(self, config):
+    def __init__(self, config, ttclient):
         self.available_services = {}
         self.fallback_service = 'yt'
+        # Only yt reads the channel, to match its format to the channel bitrate
+        service_args = {'yt': (ttclient,)}
         for service_name in config['available_services']:
             service_class = globals()[service_name].Service
-            self.available_services[service_name] = service_class(config['available_services'][service_name])
+            self.available_services[service_name] = service_class(config['available_services'][service_name], *service_args.get(service_name, ()))
         self.service = self.available_services[config['default_service']]
 
     def initialize(self):
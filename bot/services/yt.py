@@ -1,4 +1,6 @@
 import logging
+import math
+import sys
 
 from youtube_dl import YoutubeDL
 from youtubesearchpython import VideosSearch
@@ -8,14 +10,25 @@ from bot.player.track import Track
 from bot import errors
 
 class Service:
-    def __init__(self, config):
+    default_format = 'm4a/bestaudio/best'
+    ttclient = None
+
+    def __init__(self, config, ttclient):
         self.name = 'yt'
         self.hostnames = []
+        self.config = config
+        self.ttclient = ttclient
+
+    def __getstate__(self):
+        # Tracks are pickled into the cache together with their service, but the client cannot be
+        state = self.__dict__.copy()
+        state.pop('ttclient', None)
+        return state
 
     def initialize(self):
         self._ydl_config = {
             'skip_download': True,
-            'format': 'm4a/bestaudio/best',
+            'format': self.default_format,
             'socket_timeout': 5,
             'logger': logging.getLogger('root')
         }
@@ -23,7 +36,7 @@ class Service:
     def get(self, url, extra_info=None, process=True):
         if not (url or extra_info):
             raise errors.InvalidArgumentError()
-        with YoutubeDL(self._ydl_config) as ydl:
+        with YoutubeDL(dict(self._ydl_config, format=self.get_format())) as ydl:
             if not extra_info:
                 info = ydl.extract_info(url, process=False)
             else:
@@ -40,7 +53,7 @@ class Service:
                     tracks += data
                 return tracks
             if not process:
-                return [Track(service=self, extra_info=info)]
+                return [Track(service=self, extra_info=self._compact_info(info))]
             stream = ydl.process_ie_result(info)
             if 'url' in stream:
                 url = stream['url']
@@ -54,7 +67,31 @@ class Service:
                 type = TrackType.Live
             else:
                 type = TrackType.Default
-            return [Track(url=url, name=title, format=format, type=type)]
+            webpage_url = stream.get('webpage_url')
+            origin = (self, webpage_url, None) if webpage_url else None
+            return [Track(url=url, name=title, format=format, type=type, origin=origin)]
+
+    def get_format(self):
+        if not self.ttclient or not self.config['match_channel_bitrate']:
+            return self.default_format
+        try:
+            bitrate = self.ttclient.channel.bitrate
+        except Exception:
+            logging.debug('Cannot get the channel bitrate', exc_info=True)
+            return self.default_format
+        if not bitrate:
+            return self.default_format
+        # The channel re-encodes everything, so the smallest audio-only format at its bitrate sounds the same as the best one
+        abr = math.ceil(bitrate / 1000)
+        return 'worstaudio[acodec=opus][abr>={abr}]/worstaudio[abr>={abr}]/{default}'.format(abr=abr, default=self.default_format)
+
+    def _compact_info(self, info):
+        # Unprocessed entries can carry full metadata with every format; a url entry is enough to resolve them later
+        url = info.get('webpage_url') or info.get('url')
+        ie_key = info.get('ie_key') or info.get('extractor_key')
+        if not (url and ie_key):
+            return info
+        return {'_type': 'url', 'url': url, 'ie_key': sys.intern(ie_key), 'id': info.get('id')}
 
     def search(self, text):
         search = VideosSearch(text, limit=300).result()
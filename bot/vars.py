@@ -9,8 +9,24 @@ Authors: Gumerov_amir, A11CF0, Beqa Gozalishvili.
 Home page: https://github.com/gumerov-amir/TTMediaBot\
 """)
 loop_timeout = 0.01
-max_message_length = 256
+windows_wait_timeout = 1
+max_message_length = 511
+page_size = 10
+page_expiry = 300
+shuffle_no_repeat = 10
+shuffle_history_size = 1000
+track_list_chunk_size = 256
+player_transition_log_size = 100
+stall_check_interval = 1
+stall_reconnect_initial_delay = 1
+stall_reconnect_max_delay = 30
 recents_max_lenth = 32
 tt_event_timeout = 2
+tt_event_batch_size = 32
+reconnection_initial_delay = 1
+connection_step_timeout = 10
+file_upload_timeout = 600
+probe_window = 20
+metrics_window = 1024
 
 directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+loop_timeout = 0.01
+idle_duration = 2
+pickup_samples = 200
+split_repeat = 5
+shuffle_length = 100000
+shuffle_skips = 1000
+track_count = 1000
+queue_length = 100000
+queue_operations = 1000
+
+
+def polling_loop(message_queue, stop, counter, pickups):
+    while not stop.is_set():
+        counter[0] += 1
+        try:
+            sent = message_queue.get_nowait()
+            pickups.append(time.perf_counter() - sent)
+        except queue.Empty:
+            pass
+        time.sleep(loop_timeout)
+
+
+def blocking_loop(message_queue, stop, counter, pickups):
+    while True:
+        counter[0] += 1
+        sent = message_queue.get()
+        if sent is None:
+            break
+        pickups.append(time.perf_counter() - sent)
+
+
+def measure_loop(loop):
+    message_queue = queue.Queue()
+    stop = threading.Event()
+    counter = [0]
+    pickups = []
+    thread = threading.Thread(target=loop, args=(message_queue, stop, counter, pickups), daemon=True)
+    thread.start()
+    time.sleep(idle_duration)
+    wakeups = counter[0] / idle_duration
+    for i in range(pickup_samples):
+        message_queue.put(time.perf_counter())
+        time.sleep(loop_timeout * 1.5)
+    time.sleep(loop_timeout * 2)
+    stop.set()
+    message_queue.put(None)
+    thread.join()
+    return wakeups, pickups
+
+
+def main_loop_suite():
+    for name, loop in (('polling (before)', polling_loop), ('blocking (after)', blocking_loop)):
+        wakeups, pickups = measure_loop(loop)
+        print('{name}: {wakeups:.1f} idle wakeups/s, pickup latency mean {mean:.3f} ms, max {max:.3f} ms'.format(name=name, wakeups=wakeups, mean=statistics.mean(pickups) * 1000, max=max(pickups) * 1000))
+
+
+def legacy_split(text, max_length):
+    if len(text) <= max_length:
+        lines = [text]
+    else:
+        lines = ['']
+        for line in text.split('\n'):
+            if len(line) <= max_length:
+                if len(lines[-1]) > 0 and len(lines[-1]) + len(line) + 1 <= max_length:
+                    lines[-1] += '\n' + line
+                elif len(lines) == 1 and len(lines[0]) == 0:
+                    lines[0] = line
+                else:
+                    lines.append(line)
+            else:
+                words = ['']
+                for word in line.split(' '):
+                    if len(word) <= max_length:
+                        if len(words[-1]) > 0 and len(words[-1]) + len(word) + 1 <= max_length:
+                            words[-1] += ' ' + word
+                        elif len(words) == 1 and len(words[0]) == 0:
+                            words[0] == word
+                        else:
+                            words.append(word)
+                    else:
+                        chunk = word
+                        for i in range(0, int(len(chunk) / max_length) + 1):
+                            words.append(chunk[0:max_length])
+                            chunk = chunk[max_length::]
+                lines += words
+    return lines
+
+
+def split_suite():
+    from bot import vars
+    from bot.TeamTalk import split
+    max_length = vars.max_message_length
+    texts = {
+        'short reply': 'Playing Some Artist - Some Track',
+        '300-line list': '\n'.join('{}: Artist number {} - Track title number {}'.format(i + 1, i, i) for i in range(300)),
+        '300-line cyrillic list': '\n'.join('{}: Исполнитель {} - Название трека {}'.format(i + 1, i, i) for i in range(300)),
+        'long single word': 'x' * 100000,
+    }
+    for name, text in texts.items():
+        for label, function in (('before', legacy_split), ('after', split)):
+            number = max(1, int(20000 / len(text)))
+            elapsed = min(timeit.repeat(lambda: function(text, max_length), number=number, repeat=split_repeat)) / number
+            chunks = function(text, max_length)
+            print('{name} ({label}): {elapsed:.1f} us, {count} messages, max {size} bytes'.format(name=name, label=label, elapsed=elapsed * 1000000, count=len(chunks), size=max(len(chunk.encode('utf-8')) for chunk in chunks)))
+
+
+def shuffle_suite():
+    from bot.player.shuffle import Shuffle
+    start_time = time.perf_counter()
+    index_list = list(range(shuffle_length))
+    random.shuffle(index_list)
+    setup = time.perf_counter() - start_time
+    # Skips start mid-list, where an average position in a long session is
+    track_index = index_list[shuffle_length // 2]
+    start_time = time.perf_counter()
+    for i in range(shuffle_skips):
+        track_index = index_list[index_list.index(track_index) + 1]
+    skip = (time.perf_counter() - start_time) / shuffle_skips
+    print('index list (before): setup {setup:.1f} ms, next {skip:.1f} us'.format(setup=setup * 1000, skip=skip * 1000000))
+    start_time = time.perf_counter()
+    shuffle = Shuffle(shuffle_length)
+    shuffle.next()
+    setup = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for i in range(shuffle_skips):
+        shuffle.next()
+    skip = (time.perf_counter() - start_time) / shuffle_skips
+    start_time = time.perf_counter()
+    for i in range(shuffle_skips):
+        shuffle.previous()
+    back = (time.perf_counter() - start_time) / shuffle_skips
+    start_time = time.perf_counter()
+    shuffle.append(shuffle_length)
+    append = time.perf_counter() - start_time
+    print('lazy shuffle (after): setup {setup:.3f} ms, next {skip:.1f} us, previous {back:.2f} us, append {append:.1f} us'.format(setup=setup * 1000, skip=skip * 1000000, back=back * 1000000, append=append * 1000000))
+
+
+
+class LegacyTrack:
+    def __init__(self, service=None, url=None, name=None, format=None, extra_info=None, type=None):
+        self.service = service
+        self.url = url
+        self.name = name
+        self.format = format
+        self.extra_info = extra_info
+        self.type = type
+        self._is_fetched = False
+
+
+def sample_info(i):
+    # Roughly what youtube_dl returns for a single video before processing
+    video_id = 'video{:06d}'.format(i)
+    return {
+        'id': video_id,
+        'title': 'Track title number {}'.format(i),
+        'uploader': 'Artist number {}'.format(i),
+        'description': 'Description line\n' * 20,
+        'webpage_url': 'https://www.youtube.com/watch?v={}'.format(video_id),
+        'extractor_key': 'Youtube',
+        'tags': ['tag{}'.format(j) for j in range(15)],
+        'thumbnails': [{'url': 'https://i.ytimg.com/vi/{}/{}.jpg'.format(video_id, j), 'width': 120 * j, 'height': 90 * j} for j in range(10)],
+        'formats': [{'format_id': str(j), 'url': 'https://example.googlevideo.com/videoplayback?id={}&itag={}&expire=0000000000&signature={}'.format(video_id, j, 'x' * 80), 'ext': 'm4a', 'acodec': 'mp4a.40.2', 'abr': 128, 'filesize': 1000000 + j} for j in range(20)],
+    }
+
+
+def measure_tracks(create):
+    tracemalloc.start()
+    tracks = [create(i) for i in range(track_count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, tracks
+
+
+def track_suite():
+    from bot.player.track import Track
+    from bot.services.yt import Service
+    service = Service(None, None)
+    for label, create in (
+        ('dict track, full info (before)', lambda i: LegacyTrack(service=service, extra_info=sample_info(i), format='m4a')),
+        ('slotted track, compact info (after)', lambda i: Track(service=service, extra_info=service._compact_info(sample_info(i)), format='m4a')),
+    ):
+        size, tracks = measure_tracks(create)
+        print('{label}: {size:.1f} KiB per {count} tracks'.format(label=label, size=size / 1024, count=track_count))
+
+
+
+def queue_suite():
+    from bot.player.track_list import TrackList
+    tracks = list(range(queue_length))
+    start_time = time.perf_counter()
+    for i in range(queue_operations):
+        # Every request used to replace the whole list
+        tracks = tracks[:i] + [i] + tracks[i:]
+    insert = (time.perf_counter() - start_time) / queue_operations
+    print('list replace (before): insert {insert:.1f} us'.format(insert=insert * 1000000))
+    track_list = TrackList(range(queue_length))
+    start_time = time.perf_counter()
+    for i in range(queue_operations):
+        track_list.insert(random.randrange(queue_length), [i])
+    insert = (time.perf_counter() - start_time) / queue_operations
+    start_time = time.perf_counter()
+    for i in range(queue_operations):
+        track_list.move(random.randrange(queue_length), random.randrange(queue_length))
+    move = (time.perf_counter() - start_time) / queue_operations
+    start_time = time.perf_counter()
+    for i in range(queue_operations):
+        track_list[random.randrange(queue_length)]
+    lookup = (time.perf_counter() - start_time) / queue_operations
+    print('chunked track list (after): insert {insert:.1f} us, move {move:.1f} us, lookup {lookup:.1f} us'.format(insert=insert * 1000000, move=move * 1000000, lookup=lookup * 1000000))
+
+
+suites = {
+    'loop': main_loop_suite,
+    'split': split_suite,
+    'shuffle': shuffle_suite,
+    'track': track_suite,
+    'queue': queue_suite,
+}
+
+
+def main():
+    names = sys.argv[1:] if len(sys.argv) > 1 else list(suites)
+    for name in names:
+        if name not in suites:
+            sys.exit('Unknown suite: {}. Available: {}'.format(name, ', '.join(suites)))
+        print('== {} =='.format(name))
+        suites[name]()
+
+
+if __name__ == '__main__':
+    main()